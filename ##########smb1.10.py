@@ -11,6 +11,11 @@ import random
 import math
 import json
 import os
+import time
+import queue
+import threading
+import weakref
+from collections import OrderedDict
 
 # ──────────────────────────────────────────────────────────────
 #  INIT
@@ -23,6 +28,14 @@ SW, SH = 800, 600
 TILE   = 40
 FPS    = 60
 
+# SMB_LOWRES=N (2, 4, 5 or 8) renders the whole world (sky, background, tiles
+# and sprites) into a 1/N size surface with TILE//N tiles, then upscales it once
+# per frame; only the HUD and overlays are drawn at full size on top.
+LOWRES = int(os.environ.get('SMB_LOWRES','1') or 1)
+if LOWRES<1 or TILE%LOWRES or SW%LOWRES or SH%LOWRES:
+    print(f"SMB_LOWRES={LOWRES} must divide {TILE}/{SW}/{SH}; using full resolution"); LOWRES=1
+RTILE, RW, RH = TILE//LOWRES, SW//LOWRES, SH//LOWRES
+
 # ──────────────────────────────────────────────────────────────
 #  TILE IDs
 # ──────────────────────────────────────────────────────────────
@@ -32,6 +45,20 @@ COIN_BLOCK=9; STAR_BLOCK=10; HIDDEN_1UP=11; PLATFORM=12
 
 SOLID = {GROUND,BRICK,QBLOCK,USED,PIPE_TL,PIPE_TR,PIPE_BL,PIPE_BR,
          COIN_BLOCK,STAR_BLOCK,HIDDEN_1UP,PLATFORM}
+SOLID_LUT = np.zeros(256,bool); SOLID_LUT[list(SOLID)] = True
+
+class TileGrid(np.ndarray):
+    """(rows, cols) uint8 level grid carrying a parallel boolean `solid` mask.
+
+    Views and slices share the tile data but not the mask; change tiles only
+    through set_tile() so the two never disagree."""
+    def __new__(cls,rows):
+        g=np.array(rows,np.uint8).view(cls); g.solid=SOLID_LUT[g.view(np.ndarray)]
+        return g
+    def __array_finalize__(self,obj): self.solid=None
+
+    def set_tile(self,col,row,tile):
+        self[row,col]=tile; self.solid[row,col]=SOLID_LUT[tile]
 
 # ──────────────────────────────────────────────────────────────
 #  COLORS  (NES palette approximations)
@@ -137,6 +164,12 @@ class MusicEngine:
         if name==self.theme: return
         self.theme=name; self.notes=self.THEMES.get(name,[]); self.idx=0; self.timer=0.0; self.loop=loop
 
+    def due_ms(self):
+        """Milliseconds until the next note is due, or None when nothing will play."""
+        if not self.notes or not self._ch: return None
+        if self.idx>=len(self.notes) and not self.loop: return None
+        return max(1,int(self.timer*1000))
+
     def update(self, dt):
         if not self.notes or not self._ch: return
         self.timer -= dt
@@ -175,7 +208,7 @@ def lt_sky(lt):   return {'overworld':SKY,'underground':CAVE_SKY,
 LEVELS_DIR = "levels"
 
 def load_level_from_json(w, l):
-    """Try to load a level from a JSON file. Returns (grid, width) or None."""
+    """Try to load a level from a JSON file. Returns (TileGrid, width) or None."""
     filename = f"level_{w}-{l}.json"
     filepath = os.path.join(LEVELS_DIR, filename)
     if not os.path.exists(filepath):
@@ -183,13 +216,13 @@ def load_level_from_json(w, l):
     with open(filepath, 'r') as f:
         data = json.load(f)
     # Data should be a list of rows (each a list of ints)
-    grid = data
-    H = len(grid)
+    grid = TileGrid(data)
+    H = grid.shape[0]
     if H != 15:
         print(f"Warning: {filename} has {H} rows, expected 15. Adjusting...")
         # You can decide how to handle – maybe pad or truncate.
         # For simplicity we'll assume correct.
-    W = len(grid[0]) if H > 0 else 0
+    W = grid.shape[1] if H > 0 else 0
     return grid, W
 
 # ──────────────────────────────────────────────────────────────
@@ -325,11 +358,9 @@ def build_level(w,l):
     if json_result is not None:
         return json_result
     # Fallback to built‑in builders or procedural generation
-    fn = BUILDERS.get((w, l))
-    if fn:
-        return fn()
-    else:
-        return build_proc(w, l)
+    fn = BUILDERS.get((w, l), lambda: build_proc(w, l))
+    g, W = fn()
+    return TileGrid(g), W
 
 # ──────────────────────────────────────────────────────────────
 #  ENEMY SPAWN DATA  (1-1 hand-placed; rest procedural)
@@ -340,61 +371,97 @@ SPAWNS_1_1 = [('goomba',22),('goomba',40),('goomba',41),('goomba',80),
 SPAWNS_1_2 = [('goomba',10),('goomba',22),('koopa',35),('goomba',50),('koopa',70)]
 NAMED = {(1,1):SPAWNS_1_1,(1,2):SPAWNS_1_2}
 
-def _gnd(grid, col):
-    H,W=len(grid),len(grid[0])
-    col=min(col,W-1)
-    for ey in range(H-3,0,-1):
-        if grid[ey][col] in SOLID: return ey
-    return H-3
+def _gnd(grid, col, rows=1):
+    """Row whose top surface an enemy `rows` tiles tall spawned in `col` stands
+    on: the lowest solid run above the ground that is climbed to its top (pipes,
+    stairs) and has that much headroom, else the ground. Runs reaching the
+    top rows are ceilings, not floors."""
+    H,W=grid.shape; s=grid.solid[:,min(col,W-1)]
+    row=H-3
+    while row>2:
+        if not s[row]: row-=1; continue
+        while row>0 and s[row-1]: row-=1
+        if row<=2: break
+        if not s[max(0,row-rows):row].any(): return row
+        row-=1
+    return H-2
 
 def _mk(etype,col,grid):
     ey=_gnd(grid,col)
-    r=pygame.Rect(col*TILE,(ey-1)*TILE+8,TILE-6,TILE-6)
+    r=new_rect(col*TILE,0,TILE-6,TILE-6); r.bottom=ey*TILE
     return {'type':etype,'rect':r,'vx':-1,'vy':0,'alive':True,'death_timer':0,
             'on_ground':False,'shell':False,'shell_vx':0,'anim':0,
             'hp':(5 if etype=='bowser' else 1),'throw_timer':60,'fire_timer':180}
 
 def spawn_enemies(grid,world,lnum,W):
-    H=len(grid); lt=LEVEL_TYPE[(world,lnum)]
+    """Column-sorted spawn list of (col, type, args); EnemySpawner builds the enemies."""
+    H=grid.shape[0]; lt=LEVEL_TYPE[(world,lnum)]
     rng=random.Random(world*1000+lnum*37+13)
-    enemies=[]
+    spawns=[]
     named=NAMED.get((world,lnum))
     if named:
-        for et,col in named: enemies.append(_mk(et,col,grid))
+        for et,col in named: spawns.append((col,et,None))
     else:
         placed=[]
         for _ in range(3+world*2+lnum):
             for _ in range(20):
                 ex=rng.randint(10,W-12)
                 if any(abs(ex-p)<4 for p in placed): continue
-                if ex<W and grid[H-1][ex]==AIR: continue
-                placed.append(ex); enemies.append(_mk('goomba',ex,grid)); break
+                if ex<W and grid[H-1,ex]==AIR: continue
+                placed.append(ex); spawns.append((ex,'goomba',None)); break
         for _ in range(world//2+lnum//2):
             for _ in range(20):
                 ex=rng.randint(12,W-12)
                 if any(abs(ex-p)<5 for p in placed): continue
-                if ex<W and grid[H-1][ex]==AIR: continue
-                placed.append(ex); enemies.append(_mk('koopa',ex,grid)); break
+                if ex<W and grid[H-1,ex]==AIR: continue
+                placed.append(ex); spawns.append((ex,'koopa',None)); break
         for _ in range(world//3):
             for _ in range(20):
                 ex=rng.randint(15,W-20)
                 if any(abs(ex-p)<6 for p in placed): continue
-                if ex<W and grid[H-1][ex]==AIR: continue
-                placed.append(ex); enemies.append(_mk('hammerbro',ex,grid)); break
+                if ex<W and grid[H-1,ex]==AIR: continue
+                placed.append(ex); spawns.append((ex,'hammerbro',None)); break
     if lt=='castle':
         for i in range(2+world//2):
-            fx=rng.randint(10,W-20)*TILE; fy=rng.randint(3,8)*TILE
-            enemies.append({'type':'firebar','cx':fx,'cy':fy,'angle':i*60.0,
-                            'radius':(2+i%3)*TILE,'speed':1.5+world*0.25,
-                            'alive':True,'death_timer':0,'rect':pygame.Rect(fx,fy,16,16),
-                            'hp':1,'vx':0,'vy':0,'on_ground':False,'anim':0,
-                            'throw_timer':0,'fire_timer':0,'shell':False,'shell_vx':0})
-        bx=W-30; ey=_gnd(grid,bx)
-        r=pygame.Rect(bx*TILE,(ey-2)*TILE,TILE*2,TILE*2)
-        enemies.append({'type':'bowser','rect':r,'vx':-0.4,'vy':0,'alive':True,
-                        'death_timer':0,'on_ground':False,'hp':5,'anim':0,
-                        'fire_timer':180,'throw_timer':0,'shell':False,'shell_vx':0})
-    return enemies
+            fx=rng.randint(10,W-20)*TILE; fy=rng.randint(3,8)*TILE; rad=(2+i%3)*TILE
+            # keyed by the left end of its sweep so it wakes before its arm shows
+            spawns.append(((fx-rad)//TILE,'firebar',(fx,fy,i*60.0,rad,1.5+world*0.25)))
+        spawns.append((W-30,'bowser',None))
+    spawns.sort(key=lambda sp:sp[0])
+    return spawns
+
+def _activate(sp,grid):
+    col,t,args=sp
+    if t=='firebar':
+        fx,fy,angle,rad,speed=args
+        return {'type':'firebar','cx':fx,'cy':fy,'angle':angle,'radius':rad,'speed':speed,
+                'alive':True,'death_timer':0,'rect':new_rect(fx,fy,16,16),
+                'hp':1,'vx':0,'vy':0,'on_ground':False,'anim':0,
+                'throw_timer':0,'fire_timer':0,'shell':False,'shell_vx':0}
+    if t=='bowser':
+        ey=min(_gnd(grid,col,2),_gnd(grid,col+1,2))
+        r=new_rect(col*TILE,(ey-2)*TILE,TILE*2,TILE*2)
+        return {'type':'bowser','rect':r,'vx':-0.4,'vy':0,'alive':True,
+                'death_timer':0,'on_ground':False,'hp':5,'anim':0,
+                'fire_timer':180,'throw_timer':0,'shell':False,'shell_vx':0}
+    return _mk(t,col,grid)
+
+SPAWN_MARGIN = 3    # columns past the right screen edge at which enemies wake
+RETIRE_COLS  = 16   # columns behind the left screen edge before one is dropped
+
+class EnemySpawner:
+    """Activation cursor over a column-sorted spawn list (the NES enemy-object
+    pointer): enemies are built as the camera nears them and retired once they
+    fall well behind it, so per-frame work tracks the screen, not the level."""
+    def __init__(self,spawns): self.spawns=spawns; self.i=0
+
+    def update(self,cam,grid,enemies):
+        sp=self.spawns; edge=(cam+SW)//TILE+SPAWN_MARGIN
+        while self.i<len(sp) and sp[self.i][0]<=edge:
+            enemies.append(_activate(sp[self.i],grid)); self.i+=1
+        back=cam-RETIRE_COLS*TILE
+        enemies[:]=[e for e in enemies
+                    if e['rect'].right>=back and (e['alive'] or e['death_timer']>0)]
 
 # ──────────────────────────────────────────────────────────────
 #  PHYSICS CONSTANTS  (tuned from disassembly tables)
@@ -408,6 +475,106 @@ JUMP_VY_RUN   = -15.5
 JUMP_HOLD_G   = 0.42   # fraction of gravity while holding jump
 FRICTION      = 0.84
 
+# ──────────────────────────────────────────────────────────────
+#  AABB  (overlap tests on plain ints; entities keep one reusable Rect)
+# ──────────────────────────────────────────────────────────────
+# Game code builds Rects only through new_rect(), so RECT_ALLOCS is every Rect
+# it makes per frame (the F3 overlay line); hot paths pass plain tuples
+# instead.  Rects returned by Surface.blit itself are not counted.
+RECT_ALLOCS = [0]
+
+def new_rect(x,y,w,h):
+    RECT_ALLOCS[0]+=1; return pygame.Rect(x,y,w,h)
+
+def hits(r,x,y,w,h):
+    """Rect `r` against a raw box."""
+    return r.x<x+w and x<r.x+r.w and r.y<y+h and y<r.y+r.h
+
+SWEEP_EPS = 1e-6
+
+def box_free(solid,x,y,w,h,T=TILE):
+    """True if box (x,y,w,h) overlaps no solid cell; off-grid cells are empty."""
+    H,W=solid.shape; e=SWEEP_EPS
+    r0=max(0,int((y+e)//T)); r1=min(H-1,int((y+h-e)//T))
+    c0=max(0,int((x+e)//T)); c1=min(W-1,int((x+w-e)//T))
+    return r0>r1 or c0>c1 or not solid[r0:r1+1,c0:c1+1].any()
+
+def unstick(solid,x,y,w,h,T=TILE):
+    """Shortest single-axis (dx,dy) that takes the box out of the solid cells
+    it overlaps, (0,0) if it is free. sweep() only sees cells entered while
+    moving, so callers push out with this first."""
+    if box_free(solid,x,y,w,h,T): return 0,0
+    H,W=solid.shape; e=SWEEP_EPS; exits=set()
+    for row in range(max(0,int((y+e)//T)),min(H-1,int((y+h-e)//T))+1):
+        for col in range(max(0,int((x+e)//T)),min(W-1,int((x+w-e)//T))+1):
+            if solid[row,col]:
+                exits.update(((col*T-x-w,0),((col+1)*T-x,0),(0,row*T-y-h),(0,(row+1)*T-y)))
+    for dx,dy in sorted(exits,key=lambda d:(abs(d[0])+abs(d[1]),d[1]>0)):
+        if box_free(solid,x+dx,y+dy,w,h,T): return dx,dy
+    row=int((y+h-e)//T)          # wedged: climb the column until clear
+    while row>=0 and not box_free(solid,x,row*T-h,w,h,T): row-=1
+    return 0,row*T-h-y
+
+def sweep(solid,x,y,w,h,dx,dy,T=TILE):
+    """First solid cell hit by box (x,y,w,h) moving by (dx,dy).
+
+    DDA over the grid lines the leading edges cross: only the row/column
+    strip entered at each crossing is tested. Returns (t,nx,ny,col,row) with
+    t in [0,1] and (nx,ny) the normal of the face hit, or None if the path is
+    clear. Cells the box already overlaps at t=0 are ignored; off-grid cells
+    are empty."""
+    sx=(dx>0)-(dx<0); sy=(dy>0)-(dy<0)
+    if not (sx or sy): return None
+    H,W=solid.shape; e=SWEEP_EPS
+    if sx>0:   cx=int((x+w-e)//T); tx=((cx+1)*T-x-w)/dx; dtx=T/dx
+    elif sx<0: cx=int((x+e)//T);   tx=(cx*T-x)/dx;       dtx=-T/dx
+    else:      tx=dtx=2.0
+    if sy>0:   cy=int((y+h-e)//T); ty=((cy+1)*T-y-h)/dy; dty=T/dy
+    elif sy<0: cy=int((y+e)//T);   ty=(cy*T-y)/dy;       dty=-T/dy
+    else:      ty=dty=2.0
+    while True:
+        if tx<=ty:
+            if tx>1: return None
+            cx+=sx
+            if 0<=cx<W:
+                y0=y+dy*tx
+                for row in range(max(0,int((y0+e)//T)),min(H-1,int((y0+h-e)//T))+1):
+                    if solid[row,cx]: return tx,-sx,0,cx,row
+            tx+=dtx
+        else:
+            if ty>1: return None
+            cy+=sy
+            if 0<=cy<H:
+                x0=x+dx*ty
+                for col in range(max(0,int((x0+e)//T)),min(W-1,int((x0+w-e)//T))+1):
+                    if solid[cy,col]: return ty,0,-sy,col,cy
+            ty+=dty
+
+# ──────────────────────────────────────────────────────────────
+#  BROADPHASE  (entities bucketed by tile column)
+# ──────────────────────────────────────────────────────────────
+class ColumnHash:
+    """Uniform-grid broadphase over tile columns. An item sits in every column
+    its box spans; query() returns each candidate once, in insertion order."""
+    def __init__(self,T=TILE): self.T=T; self.cells={}; self.n=0
+
+    def clear(self): self.cells.clear(); self.n=0
+
+    def insert(self,item,x,w):
+        T=self.T; i=self.n; self.n+=1; cells=self.cells
+        for c in range(x//T,(x+w-1)//T+1):
+            b=cells.get(c)
+            if b is None: cells[c]=[(i,item)]
+            else: b.append((i,item))
+
+    def query(self,x,w):
+        T=self.T; c0=x//T; c1=(x+w-1)//T; get=self.cells.get
+        if c0==c1: return [it for _,it in get(c0,())]
+        found={}
+        for c in range(c0,c1+1):
+            for i,it in get(c,()): found[i]=it
+        return [found[i] for i in sorted(found)]
+
 # ──────────────────────────────────────────────────────────────
 #  PLAYER
 # ──────────────────────────────────────────────────────────────
@@ -422,32 +589,29 @@ class Player:
         self.star_timer=0
         self.dead=False; self.death_timer=0
         self.jump_held=False; self._fire_cd=0
+        self._r=new_rect(0,0,self.w,self.h)
 
     @property
-    def rect(self): return pygame.Rect(int(self.x),int(self.y),self.w,self.h)
+    def rect(self):
+        """Shared Rect synced to x/y/w/h on access; don't hold it across moves."""
+        r=self._r; r.update(int(self.x),int(self.y),self.w,self.h); return r
     @property
     def big(self):  return self.status>=1
 
     def _collide(self,dx,dy,grid):
-        H,W=len(grid),len(grid[0])
-        self.x+=dx; self.y+=dy
-        r=self.rect; hit=None
-        c0=max(0,r.left//TILE); c1=min(W-1,r.right//TILE)
-        r0=max(0,r.top//TILE);  r1=min(H-1,r.bottom//TILE)
-        for row in range(r0,r1+1):
-            for col in range(c0,c1+1):
-                if grid[row][col] not in SOLID: continue
-                b=pygame.Rect(col*TILE,row*TILE,TILE,TILE)
-                if not r.colliderect(b): continue
-                if   dx>0:  self.x=b.left-self.w
-                elif dx<0:  self.x=b.right
-                elif dy>0:  self.y=b.top-self.h; self.vy=0; self.on_ground=True
-                elif dy<0:  self.y=b.bottom; self.vy=0; hit=(col,row)
-                r=self.rect
-        return hit
+        """Move by (dx,dy), stopping flush at the first solid tile; returns a bumped (col,row)."""
+        hit=sweep(grid.solid,self.x,self.y,self.w,self.h,dx,dy)
+        if not hit: self.x+=dx; self.y+=dy; return None
+        t,nx,ny,col,row=hit
+        self.x+=dx*t; self.y+=dy*t
+        if   nx<0: self.x=col*TILE-self.w
+        elif nx>0: self.x=(col+1)*TILE
+        elif ny<0: self.y=row*TILE-self.h; self.vy=0; self.on_ground=True
+        else:      self.y=(row+1)*TILE; self.vy=0; return (col,row)
+        return None
 
     def update(self,keys,grid,bumped,fireballs):
-        H,W=len(grid),len(grid[0])
+        H,W=grid.shape
         if self.dead:
             self.death_timer+=1; self.vy+=GRAVITY*0.5; self.y+=self.vy; return
         if self.invincible>0: self.invincible-=1
@@ -477,19 +641,15 @@ class Player:
             fireballs.append(Fireball(
                 self.x+(self.w if self.facing>0 else 0),
                 self.y+self.h*0.3, self.facing))
-            play('fire'); self._fire_cd=20
+            play('fire'); self._fire_cd=FIRE_CD
 
+        ox,oy=unstick(grid.solid,self.x,self.y,self.w,self.h); self.x+=ox; self.y+=oy
         was_on=self.on_ground; self.on_ground=False
         self._collide(self.vx,0,grid)
         b=self._collide(0,self.vy,grid)
         if b: bumped.append(b)
         if not self.on_ground and was_on:
-            tr=pygame.Rect(int(self.x),int(self.y)+self.h+2,self.w,2)
-            for row in range(max(0,tr.top//TILE),min(H-1,tr.bottom//TILE)+1):
-                for col in range(max(0,tr.left//TILE),min(W-1,tr.right//TILE)+1):
-                    if grid[row][col] in SOLID:
-                        if tr.colliderect(pygame.Rect(col*TILE,row*TILE,TILE,TILE)):
-                            self.on_ground=True
+            if sweep(grid.solid,self.x,self.y,self.w,self.h,0,4): self.on_ground=True
         self.x=max(0,self.x)
         if self.y>H*TILE: self.kill()
 
@@ -511,17 +671,137 @@ class Player:
     def draw(self,screen,cx):
         if self.dead and self.death_timer%4<2: return
         if self.invincible>0 and self.invincible%8<4: return
-        col=STAR_C if self.star_timer>0 and (self.star_timer//4)%2==0 else RED
-        rx=int(self.x)-cx; ry=int(self.y); bw=self.w; bh=self.h
-        pygame.draw.rect(screen,col,(rx,ry,bw,bh))
-        pygame.draw.rect(screen,MARIO_HAT,(rx,ry-6,bw,7))
-        ew=4; ex=rx+(bw-ew-2) if self.facing>0 else rx+2
-        pygame.draw.rect(screen,WHITE,(ex,ry+4,ew+2,5))
-        pygame.draw.rect(screen,BLACK,(ex+(ew//2 if self.facing>0 else 0),ry+5,ew//2+1,3))
-        if self.status==2:
-            pygame.draw.rect(screen,WHITE,(rx+2,ry+bh-8,bw-4,5))
-        if self.big:
-            pygame.draw.rect(screen,(180,80,0),(rx,ry-14,bw,8))
+        flash=self.star_timer>0 and (self.star_timer//4)%2==0
+        pose='throw' if self._fire_cd>FIRE_CD-THROW_FRAMES else 'stand'
+        if PAL:   # star flash is a palette swap on one indexed sprite
+            spr=player_sprite(self.status,self.facing,None,self.w,self.h,pose)
+            PAL.phase(spr,'star',int(flash))
+        else: spr=player_sprite(self.status,self.facing,flash,self.w,self.h,pose)
+        screen.blit(spr,(int(self.x)-cx,int(self.y)-PLAYER_TOP))
+
+# Player art is rasterized lazily per (status, facing, star flash, pose, size).
+# Poses: 'stand', and 'throw' (arm out, white glove) for the first
+# THROW_FRAMES frames after a fireball.
+PLAYER_TOP   = 14         # rows above the hitbox used by the hat / big cap
+FIRE_CD      = 20         # frames between fireballs
+THROW_FRAMES = 8
+_PLAYER_SPR = {}
+
+def _raster_player(status,facing,flash,pose,bw,bh):
+    if pose not in ('stand','throw'): raise ValueError(f"unknown player pose {pose!r}")
+    s=pygame.Surface((bw,bh+PLAYER_TOP)); s.fill(KEY_C)
+    rx=0; ry=PLAYER_TOP
+    pygame.draw.rect(s,STAR_C if flash else RED,(rx,ry,bw,bh))
+    pygame.draw.rect(s,MARIO_HAT,(rx,ry-6,bw,7))
+    ew=4; ex=rx+(bw-ew-2) if facing>0 else rx+2
+    pygame.draw.rect(s,WHITE,(ex,ry+4,ew+2,5))
+    pygame.draw.rect(s,BLACK,(ex+(ew//2 if facing>0 else 0),ry+5,ew//2+1,3))
+    if status==2:
+        pygame.draw.rect(s,WHITE,(rx+2,ry+bh-8,bw-4,5))
+    if status>=1:
+        pygame.draw.rect(s,(180,80,0),(rx,ry-14,bw,8))
+    if pose=='throw':   # arm across the chest, glove at the leading edge
+        ay=ry+bh//3; gx=rx+bw-6 if facing>0 else rx
+        pygame.draw.rect(s,MARIO_HAT,(rx+bw//4,ay+1,bw//2,4))
+        pygame.draw.rect(s,WHITE,(gx,ay,6,6))
+    return s
+
+def player_sprite(status,facing,flash,bw,bh,pose='stand'):
+    key=(status,facing,flash,pose,bw,bh); spr=_PLAYER_SPR.get(key)
+    if spr is None:
+        if flash is None:   # indexed: body colour cycles on the 'star' clock
+            spr=PAL.index([_raster_player(status,facing,f,pose,bw,bh) for f in (False,True)],'star')
+        else:
+            spr=_raster_player(status,facing,flash,pose,bw,bh)
+            if pygame.display.get_surface(): spr=spr.convert()
+            spr.set_colorkey(KEY_C,pygame.RLEACCEL)
+        _PLAYER_SPR[key]=spr
+    return spr
+
+# ──────────────────────────────────────────────────────────────
+#  PICKUP / PROJECTILE SPRITE SHEET
+# ──────────────────────────────────────────────────────────────
+# One row of SHEET_CELL cells; each sprite's origin (the object's x,y) sits at
+# (SHEET_PAD,SHEET_PAD) inside its cell so art may overhang up/left.  Run with
+# --export-sprites to write the placeholder sheet; a sheet placed in
+# SPRITES_DIR (next to this file, not the working directory) replaces it
+# (magenta = transparent).
+SPRITES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),"sprites")
+SHEET_FILE  = "pickups.png"
+SHEET_CELL  = 48
+SHEET_PAD   = 8
+SHEET_NAMES = ('mushroom','flower','star','fireball',
+               'coin0','coin1','coin2','coin3','hammer','bowser_flame')
+_SHEET = {}
+
+def _raster_sheet():
+    s=pygame.Surface((SHEET_CELL*len(SHEET_NAMES),SHEET_CELL)); s.fill(KEY_C)
+    def cell(name): return SHEET_CELL*SHEET_NAMES.index(name)+SHEET_PAD, SHEET_PAD
+    rx,ry=cell('mushroom')
+    pygame.draw.rect(s,MUSHROOM_C,(rx+2,ry+8,TILE-8,TILE-12))
+    pygame.draw.ellipse(s,MUSHROOM_C,(rx,ry,TILE-4,20))
+    pygame.draw.circle(s,WHITE,(rx+6,ry+6),4)
+    pygame.draw.circle(s,WHITE,(rx+22,ry+4),5)
+    rx,ry=cell('flower')
+    pygame.draw.rect(s,(0,180,0),(rx+14,ry+12,4,16))
+    for i in range(5):
+        a=i*(2*math.pi/5)
+        pygame.draw.circle(s,FLOWER_C,(rx+16+int(math.cos(a)*10),ry+10+int(math.sin(a)*10)),6)
+    pygame.draw.circle(s,WHITE,(rx+16,ry+10),5)
+    rx,ry=cell('star'); pts=[]
+    for i in range(10):
+        rr=12 if i%2==0 else 6; a=math.pi/2+i*(math.pi/5)
+        pts.append((rx+16+int(math.cos(a)*rr),ry+16+int(math.sin(a)*rr)))
+    pygame.draw.polygon(s,STAR_C,pts)
+    rx,ry=cell('fireball')
+    pygame.draw.circle(s,(255,200,0),(rx+5,ry+5),5)
+    pygame.draw.circle(s,WHITE,(rx+4,ry+4),2)
+    for i,w in enumerate((16,10,4,10)):
+        rx,ry=cell(f'coin{i}')
+        pygame.draw.ellipse(s,COIN_YLW,(rx+(16-w)//2,ry,w,20))
+    rx,ry=cell('hammer');       pygame.draw.rect(s,HAMMER_C,(rx,ry,12,12))
+    rx,ry=cell('bowser_flame'); pygame.draw.rect(s,FIRE_C,(rx,ry,12,12))
+    return s
+
+def export_sprites(path=None):
+    """Write the built-in placeholder sheet to PNG. Returns the path."""
+    path=path or os.path.join(SPRITES_DIR,SHEET_FILE)
+    os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+    pygame.image.save(_raster_sheet(),path)
+    return path
+
+def sheet_sprites():
+    """name -> (surface, dx, dy): trimmed sprite and its offset from the object origin."""
+    if _SHEET: return _SHEET
+    path=os.path.join(SPRITES_DIR,SHEET_FILE)
+    sheet=pygame.image.load(path) if os.path.exists(path) else _raster_sheet()
+    if pygame.display.get_surface(): sheet=sheet.convert()
+    sheet.set_colorkey(KEY_C)
+    for i,name in enumerate(SHEET_NAMES):
+        c=sheet.subsurface((i*SHEET_CELL,0,SHEET_CELL,SHEET_CELL))
+        r=c.get_bounding_rect()
+        spr=c.subsurface(r).copy(); spr.set_colorkey(KEY_C,pygame.RLEACCEL)
+        _SHEET[name]=(spr,r.x-SHEET_PAD,r.y-SHEET_PAD)
+    return _SHEET
+
+def blit_sprite(screen,name,x,y):
+    spr,dx,dy=(_SHEET or sheet_sprites())[name]
+    screen.blit(spr,(x+dx,y+dy))
+
+_DISCS = {}
+
+def disc(color,r,width=0):
+    """Cached pygame.draw.circle stamp; blit it at (cx-r, cy-r)."""
+    key=(color,r,width); s=_DISCS.get(key)
+    if s is None:
+        s=pygame.Surface((2*r+1,2*r+1)); s.fill(KEY_C)
+        pygame.draw.circle(s,color,(r,r),r,width)
+        if PAL: s=PAL.index([s])
+        else:
+            if pygame.display.get_surface(): s=s.convert()
+            s.set_colorkey(KEY_C,pygame.RLEACCEL)
+        _DISCS[key]=s
+    return s
 
 # ──────────────────────────────────────────────────────────────
 #  FIREBALL
@@ -529,23 +809,26 @@ class Player:
 class Fireball:
     def __init__(self,x,y,d):
         self.x=float(x); self.y=float(y); self.vx=7*d; self.vy=-3.0
-        self.alive=True; self.bounces=0
+        self.alive=True; self.bounces=0; self._r=new_rect(0,0,10,10)
     @property
-    def rect(self): return pygame.Rect(int(self.x),int(self.y),10,10)
+    def rect(self): r=self._r; r.x=int(self.x); r.y=int(self.y); return r
 
     def update(self,grid):
-        H,W=len(grid),len(grid[0])
-        self.vy+=GRAVITY*0.8; self.x+=self.vx; self.y+=self.vy
-        col=int(self.x+5)//TILE; row=int(self.y+10)//TILE
-        if 0<=row<H and 0<=col<W and grid[row][col] in SOLID:
-            self.vy=-5; self.bounces+=1
+        H,W=grid.shape
+        self.vy+=GRAVITY*0.8
+        ox,oy=unstick(grid.solid,self.x,self.y,10,10); self.x+=ox; self.y+=oy
+        hit=sweep(grid.solid,self.x,self.y,10,10,self.vx,self.vy)
+        if not hit: self.x+=self.vx; self.y+=self.vy
+        else:
+            t,nx,ny,col,row=hit
+            self.x+=self.vx*t; self.y+=self.vy*t
+            if ny<0:  self.y=row*TILE-10; self.vy=-5; self.bounces+=1
+            elif nx:  self.alive=False      # into a wall
+            else:     self.y=(row+1)*TILE; self.vy=0
         if self.bounces>4 or self.x<0 or self.x>W*TILE or self.y>H*TILE:
             self.alive=False
 
-    def draw(self,screen,cx):
-        rx=int(self.x)-cx
-        pygame.draw.circle(screen,(255,200,0),(rx+5,int(self.y)+5),5)
-        pygame.draw.circle(screen,WHITE,(rx+4,int(self.y)+4),2)
+    def draw(self,screen,cx): blit_sprite(screen,'fireball',int(self.x)-cx,int(self.y))
 
 # ──────────────────────────────────────────────────────────────
 #  POWER-UP OBJECT
@@ -554,54 +837,31 @@ class PowerUp:
     def __init__(self,x,y,kind='mushroom'):
         self.x=float(x); self.y=float(y); self.kind=kind
         self.vx=1.5; self.vy=0.0; self.alive=True; self.anim=0
-        self.emerge_y=y-TILE; self.emerging=True
+        self.emerge_y=y-TILE; self.emerging=True; self._r=new_rect(0,0,TILE-4,TILE-4)
 
     @property
-    def rect(self): return pygame.Rect(int(self.x),int(self.y),TILE-4,TILE-4)
+    def rect(self): r=self._r; r.x=int(self.x); r.y=int(self.y); return r
 
     def update(self,grid):
-        H,W=len(grid),len(grid[0])
+        H,W=grid.shape; solid=grid.solid; s=TILE-4
         if self.emerging:
             self.y-=1.5
             if self.y<=self.emerge_y: self.y=self.emerge_y; self.emerging=False
             return
         self.vy+=GRAVITY*0.7
         if self.vy>10: self.vy=10
-        self.x+=self.vx; self.y+=self.vy
-        r=self.rect
-        c0=max(0,r.left//TILE); c1=min(W-1,r.right//TILE)
-        r0=max(0,r.top//TILE);  r1=min(H-1,r.bottom//TILE)
-        for row in range(r0,r1+1):
-            for col in range(c0,c1+1):
-                if grid[row][col] not in SOLID: continue
-                b=pygame.Rect(col*TILE,row*TILE,TILE,TILE)
-                if not r.colliderect(b): continue
-                if self.vy>0: self.y=b.top-(TILE-4); self.vy=0
-                elif self.vx>0: self.x=b.left-(TILE-4); self.vx*=-1
-                elif self.vx<0: self.x=b.right; self.vx*=-1
+        ox,oy=unstick(solid,self.x,self.y,s,s); self.x+=ox; self.y+=oy
+        hit=sweep(solid,self.x,self.y,s,s,self.vx,0)
+        if not hit: self.x+=self.vx
+        else: col=hit[3]; self.x=col*TILE-s if self.vx>0 else (col+1)*TILE; self.vx*=-1
+        hit=sweep(solid,self.x,self.y,s,s,0,self.vy)
+        if not hit: self.y+=self.vy
+        else: row=hit[4]; self.y=row*TILE-s if self.vy>0 else (row+1)*TILE; self.vy=0
         if self.y>H*TILE: self.alive=False
         self.anim+=1
 
     def draw(self,screen,cx):
-        if not self.alive: return
-        rx=int(self.x)-cx; ry=int(self.y)
-        if self.kind=='mushroom':
-            pygame.draw.rect(screen,MUSHROOM_C,(rx+2,ry+8,TILE-8,TILE-12))
-            pygame.draw.ellipse(screen,MUSHROOM_C,(rx,ry,TILE-4,20))
-            pygame.draw.circle(screen,WHITE,(rx+6,ry+6),4)
-            pygame.draw.circle(screen,WHITE,(rx+22,ry+4),5)
-        elif self.kind=='flower':
-            pygame.draw.rect(screen,(0,180,0),(rx+14,ry+12,4,16))
-            for i in range(5):
-                a=i*(2*math.pi/5)
-                pygame.draw.circle(screen,FLOWER_C,(rx+16+int(math.cos(a)*10),ry+10+int(math.sin(a)*10)),6)
-            pygame.draw.circle(screen,WHITE,(rx+16,ry+10),5)
-        else:  # star
-            pts=[]
-            for i in range(10):
-                rr=12 if i%2==0 else 6; a=math.pi/2+i*(math.pi/5)
-                pts.append((rx+16+int(math.cos(a)*rr),ry+16+int(math.sin(a)*rr)))
-            if len(pts)>=3: pygame.draw.polygon(screen,STAR_C,pts)
+        if self.alive: blit_sprite(screen,self.kind,int(self.x)-cx,int(self.y))
 
 # ──────────────────────────────────────────────────────────────
 #  COIN ANIMATION
@@ -610,27 +870,124 @@ class CoinAnim:
     def __init__(self,x,y):
         self.x=x+TILE//2-8; self.y=float(y); self.vy=-8.0; self.alive=True; self.t=0
     def update(self): self.vy+=0.6; self.y+=self.vy; self.t+=1; self.alive=self.t<40
-    def draw(self,screen,cx): pygame.draw.ellipse(screen,COIN_YLW,(self.x-cx,int(self.y),16,20))
+    def draw(self,screen,cx):
+        blit_sprite(screen,COIN_FRAMES[ANIM.index(COIN_SPIN,4)],self.x-cx,int(self.y))
+
+COIN_FRAMES = ('coin0','coin1','coin2','coin3')
 
 # ──────────────────────────────────────────────────────────────
-#  PARTICLE
+#  PARTICLES  (struct-of-arrays pool, one vectorized step per frame)
 # ──────────────────────────────────────────────────────────────
-class Particle:
-    def __init__(self,x,y,col=RED_BRICK):
-        self.x=float(x); self.y=float(y)
-        self.vx=random.uniform(-4,4); self.vy=random.uniform(-8,-2)
-        self.color=col; self.life=35
-    def update(self): self.vy+=0.5; self.x+=self.vx; self.y+=self.vy; self.life-=1
+PARTICLE_CAP  = 16384
+PARTICLE_LIFE = 35
+PARTICLE_HALF = PARTICLE_LIFE//8             # largest square half-size
+PARTICLE_M    = -(-2*PARTICLE_HALF//LOWRES)*LOWRES   # layer margin, a whole number of low-res px
+
+class Particles:
+    """Preallocated particle pool; live particles are kept packed in [0:n]
+    so spawning writes straight into the free tail.  draw() rasterizes the
+    squares with NumPy into one colorkeyed layer and queues a single blit,
+    so its cost is a few array ops rather than a Python tuple per particle."""
+    def __init__(self,cap=PARTICLE_CAP,size=(SW,SH)):
+        self.cap=cap; self.n=0; self.size=size; M=PARTICLE_M
+        self.pos=np.zeros((cap,2),np.float32); self.vel=np.zeros((cap,2),np.float32)
+        self.life=np.zeros(cap,np.int16);      self.col=np.zeros(cap,np.uint8)
+        self.layer=pygame.Surface((size[0]+2*M,size[1]+2*M),0,32)
+        self.layer.fill(KEY_C); self.layer.set_colorkey(KEY_C); _LIVE.add(self.layer)
+        self.stride=self.layer.get_pitch()//4; self.dirty=None
+        # flat pixel offsets of a (2s x 2s) square, per half-size s
+        self.offs=[(np.arange(2*r)[:,None]*self.stride+np.arange(2*r)).ravel()
+                   for r in range(PARTICLE_HALF+1)]
+        self.colors={}; self.pix=np.empty(0,np.uint32)   # color -> index -> mapped layer pixel
+        self.rng=np.random.default_rng()
+    def __len__(self): return self.n
+    def clear(self): self.n=0
+
+    def _color(self,col):
+        ci=self.colors.get(col)
+        if ci is None:
+            ci=self.colors[col]=len(self.colors)
+            self.pix=np.append(self.pix,np.uint32(self.layer.map_rgb(col)))
+        return ci
+
+    def spawn(self,x,y,col=RED_BRICK,k=1):
+        """Emit k particles at (x,y); silently drops what does not fit."""
+        k=min(k,self.cap-self.n)
+        if k<=0: return
+        a,b=self.n,self.n+k
+        self.pos[a:b]=(x,y)
+        self.vel[a:b,0]=self.rng.uniform(-4,4,k); self.vel[a:b,1]=self.rng.uniform(-8,-2,k)
+        self.life[a:b]=PARTICLE_LIFE; self.col[a:b]=self._color(col); self.n=b
+
+    def update(self):
+        n=self.n
+        if not n: return
+        vel=self.vel[:n]; vel[:,1]+=0.5; self.pos[:n]+=vel
+        life=self.life[:n]; life-=1
+        keep=life>0
+        if not keep.all():
+            m=int(np.count_nonzero(keep))
+            for arr in (self.pos,self.vel,self.life,self.col): arr[:m]=arr[:n][keep]
+            self.n=m
+
     def draw(self,screen,cx):
-        if self.life>0:
-            r=max(1,self.life//8)
-            pygame.draw.rect(screen,self.color,(int(self.x)-cx,int(self.y),r*2,r*2))
+        """Queue every on-screen particle as one layer blit. Returns how many were drawn."""
+        if self.dirty: self.layer.fill(KEY_C,self.dirty); self.dirty=None
+        n=self.n
+        if not n: return 0
+        xy=self.pos[:n].astype(np.int32); xy[:,0]-=cx
+        r=np.maximum(1,self.life[:n]//8); sw,sh=self.size
+        vis=(xy[:,0]>-2*r)&(xy[:,0]<sw)&(xy[:,1]>-2*r)&(xy[:,1]<sh)
+        m=int(np.count_nonzero(vis))
+        if not m: return 0
+        M=PARTICLE_M; x=xy[vis,0]+M; y=xy[vis,1]+M; r=r[vis]
+        base=y*self.stride+x; pix=self.pix[self.col[:n][vis]]
+        flat=np.frombuffer(self.layer.get_buffer(),np.uint32)
+        for k in range(1,PARTICLE_HALF+1):
+            sel=r==k
+            if sel.any(): flat[base[sel,None]+self.offs[k]]=pix[sel,None]
+        del flat   # release the surface lock before blitting
+        x0=int(x.min()); y0=int(y.min()); x1=int((x+2*r).max()); y1=int((y+2*r).max())
+        self.dirty=(x0,y0,x1-x0,y1-y0)
+        screen.blit(self.layer,(x0-M,y0-M),self.dirty)
+        return m
 
 # ──────────────────────────────────────────────────────────────
 #  ENEMY LOGIC
 # ──────────────────────────────────────────────────────────────
+def _enemy_unstick(r,solid):
+    dx,dy=unstick(solid,r.x,r.y,r.w,r.h)
+    if dx or dy: r.move_ip(dx,dy)
+
+def _enemy_move_x(r,solid,dx):
+    """Sweep an enemy rect dx whole pixels; moves exactly that far, or flush to
+    the wall hit. The level's ends count as walls. Returns True on a hit."""
+    hit=sweep(solid,r.x,r.y,r.w,r.h,dx,0)
+    if hit:
+        if dx>0: r.right=hit[3]*TILE
+        else:    r.left=(hit[3]+1)*TILE
+        return True
+    r.x+=dx; end=solid.shape[1]*TILE
+    if r.left<0:    r.left=0;    return True
+    if r.right>end: r.right=end; return True
+    return False
+
+def _enemy_fall(e,r,solid):
+    """Vertical sweep in whole pixels; the fraction of vy carries over to the
+    next frame, so the rect moves exactly what was swept. Sets on_ground."""
+    vy=e['vy']+e.get('sub_y',0.0); dy=int(vy)
+    if dy: hit=sweep(solid,r.x,r.y,r.w,r.h,0,dy)
+    else:  # nothing to move yet: only resting contact counts
+        hit=sweep(solid,r.x,r.y,r.w,r.h,0,1) if vy>0 else None
+        if hit and hit[0]>0: hit=None
+    e['on_ground']=bool(hit) and hit[2]<0
+    if not hit: r.y+=dy; e['sub_y']=vy-dy; return
+    if e['on_ground']: r.bottom=hit[4]*TILE
+    else:              r.top=(hit[4]+1)*TILE
+    e['vy']=0; e['sub_y']=0.0
+
 def update_enemy(e,grid,player,particles,misc):
-    H,W=len(grid),len(grid[0])
+    H,W=grid.shape; solid=grid.solid
     t=e['type']
     if not e['alive']:
         if e['death_timer']>0: e['death_timer']-=1
@@ -648,12 +1005,14 @@ def update_enemy(e,grid,player,particles,misc):
     if t=='bowser':
         e['vy']=e.get('vy',0)+GRAVITY*0.4
         if e['vy']>10: e['vy']=10
-        r.x+=int(e['vx']*TILE/10); r.y+=int(e['vy'])
+        _enemy_unstick(r,solid)
+        _enemy_move_x(r,solid,int(e['vx']*TILE/10))
         if r.left<(W-55)*TILE: e['vx']=abs(e['vx'])
         if r.right>(W-4)*TILE:  e['vx']=-abs(e['vx'])
-        rb=min(r.bottom//TILE,H-1); cm=min(r.centerx//TILE,W-1)
-        if 0<=rb<H and 0<=cm<W and grid[rb][cm] in SOLID:
-            r.bottom=rb*TILE; e['vy']=0
+        _enemy_fall(e,r,solid)
+        if e['on_ground']:   # turn back at pit edges rather than walk into the lava
+            ec=(r.right if e['vx']>0 else r.left-1)//TILE
+            if 0<=ec<W and not solid[min(r.bottom//TILE,H-1),ec]: e['vx']=-e['vx']
         e['fire_timer']=e.get('fire_timer',180)-1
         if e['fire_timer']<=0:
             e['fire_timer']=100+random.randint(0,40)
@@ -666,19 +1025,15 @@ def update_enemy(e,grid,player,particles,misc):
     vx=e['shell_vx'] if (t=='koopa' and e['shell']) else e['vx']
     e['vy']=e.get('vy',0)+GRAVITY*0.8
     if e['vy']>12: e['vy']=12
-    r.x+=int(vx); r.y+=int(e['vy'])
-    rb=min(r.bottom//TILE,H-1); cm=min(r.centerx//TILE,W-1)
-    if 0<=rb<H and 0<=cm<W and grid[rb][cm] in SOLID:
-        r.bottom=rb*TILE; e['vy']=0; e['on_ground']=True
-    else: e['on_ground']=False
-    ce=min((r.right//TILE if vx>0 else r.left//TILE),W-1); rm=min(r.centery//TILE,H-1)
-    if 0<=ce<W and 0<=rm<H and grid[rm][ce] in SOLID:
+    _enemy_unstick(r,solid)
+    if _enemy_move_x(r,solid,int(vx)):
         if t=='koopa' and e['shell']: e['shell_vx']*=-1
         else: e['vx']*=-1
+    _enemy_fall(e,r,solid)
     if t in ('goomba','koopa') and not(t=='koopa' and e['shell']) and vx!=0:
         ec=min((r.right//TILE if vx>0 else (r.left-1)//TILE),W-1)
         gr=min(r.bottom//TILE+1,H-1)
-        if 0<=ec<W and 0<=gr<H and grid[gr][ec] not in SOLID: e['vx']*=-1
+        if 0<=ec<W and 0<=gr<H and not solid[gr,ec]: e['vx']*=-1
     if t=='hammerbro':
         e['throw_timer']=e.get('throw_timer',60)-1
         if e['throw_timer']<=0:
@@ -688,59 +1043,94 @@ def update_enemy(e,grid,player,particles,misc):
                          'vx':float(dx2),'vy':-6.0,'alive':True,'t':0})
     if r.top>H*TILE: e['alive']=False
 
-def draw_enemy(screen,e,cx):
-    t=e['type']
-    if not e['alive']: return
-    r=e['rect'].copy(); r.x-=cx
+# Enemy art is rasterized once per (type, size, shell, facing, phase) into a
+# colorkeyed sprite with an ENEMY_M margin for heads, hammers and the like.
+ENEMY_M = 16
+_ENEMY_SPR = {}; _PIPS = {}
+
+def _raster_enemy(t,w,h,shell):
+    M=ENEMY_M; s=pygame.Surface((w+2*M,h+2*M)); s.fill(KEY_C)
+    r=pygame.Rect(M,M,w,h)
     if t=='goomba':
-        pygame.draw.ellipse(screen,GOOMBA_C,(r.x,r.y,r.w,r.h))
-        pygame.draw.ellipse(screen,(80,40,20),(r.x,r.y,r.w,r.h//2))
-        pygame.draw.circle(screen,WHITE,(r.x+8,r.y+12),4)
-        pygame.draw.circle(screen,WHITE,(r.x+r.w-8,r.y+12),4)
-        pygame.draw.circle(screen,BLACK,(r.x+9,r.y+13),2)
-        pygame.draw.circle(screen,BLACK,(r.x+r.w-7,r.y+13),2)
+        pygame.draw.ellipse(s,GOOMBA_C,(r.x,r.y,r.w,r.h))
+        pygame.draw.ellipse(s,(80,40,20),(r.x,r.y,r.w,r.h//2))
+        pygame.draw.circle(s,WHITE,(r.x+8,r.y+12),4)
+        pygame.draw.circle(s,WHITE,(r.x+r.w-8,r.y+12),4)
+        pygame.draw.circle(s,BLACK,(r.x+9,r.y+13),2)
+        pygame.draw.circle(s,BLACK,(r.x+r.w-7,r.y+13),2)
     elif t=='koopa':
-        pygame.draw.rect(screen,(100,60,10) if e['shell'] else KOOPA_C,r)
-        if not e['shell']: pygame.draw.ellipse(screen,(200,200,50),(r.x+2,r.y-8,r.w-4,12))
+        pygame.draw.rect(s,(100,60,10) if shell else KOOPA_C,r)
+        if not shell: pygame.draw.ellipse(s,(200,200,50),(r.x+2,r.y-8,r.w-4,12))
     elif t=='hammerbro':
-        pygame.draw.rect(screen,KOOPA_C,r)
-        pygame.draw.rect(screen,(200,200,50),(r.x+2,r.y-10,r.w-4,12))
-        pygame.draw.rect(screen,HAMMER_C,(r.x-8,r.y-16,20,10))
+        pygame.draw.rect(s,KOOPA_C,r)
+        pygame.draw.rect(s,(200,200,50),(r.x+2,r.y-10,r.w-4,12))
+        pygame.draw.rect(s,HAMMER_C,(r.x-8,r.y-16,20,10))
     elif t=='bowser':
-        pygame.draw.rect(screen,BOWSER_C,r)
-        pygame.draw.circle(screen,(0,80,0),(r.x+r.w//2,r.y+12),14)
-        pygame.draw.rect(screen,RED,(r.x+4,r.y+8,10,8))
-        pygame.draw.rect(screen,RED,(r.x+r.w-14,r.y+8,10,8))
-        for i in range(e['hp']): pygame.draw.rect(screen,(255,50,50),(r.x+i*8,r.y-10,6,6))
+        pygame.draw.rect(s,BOWSER_C,r)
+        pygame.draw.circle(s,(0,80,0),(r.x+r.w//2,r.y+12),14)
+        pygame.draw.rect(s,RED,(r.x+4,r.y+8,10,8))
+        pygame.draw.rect(s,RED,(r.x+r.w-14,r.y+8,10,8))
     elif t=='firebar':
-        pygame.draw.circle(screen,FIRE_C,(r.x+8,r.y+8),8)
-        pygame.draw.circle(screen,WHITE,(r.x+5,r.y+5),3)
+        pygame.draw.circle(s,FIRE_C,(r.x+8,r.y+8),8)
+        pygame.draw.circle(s,WHITE,(r.x+5,r.y+5),3)
+    return s
+
+def enemy_sprite(t,w,h,shell,facing,phase):
+    """Cached sprite; the base art faces left, facing=1 and odd walk phases mirror it."""
+    key=(t,w,h,shell,facing,phase); spr=_ENEMY_SPR.get(key)
+    if spr is None:
+        spr=_raster_enemy(t,w,h,shell)
+        if (facing>0)!=(phase%2==1): spr=pygame.transform.flip(spr,True,False)
+        if pygame.display.get_surface(): spr=spr.convert()
+        spr.set_colorkey(KEY_C,pygame.RLEACCEL)
+        _ENEMY_SPR[key]=spr
+    return spr
+
+def hp_pips(n):
+    """Stamp of n Bowser HP pips (6px squares every 8px)."""
+    stamp=_PIPS.get(n)
+    if stamp is None:
+        stamp=pygame.Surface((max(1,n*8),6)); stamp.fill(KEY_C)
+        for i in range(n): pygame.draw.rect(stamp,(255,50,50),(i*8,0,6,6))
+        stamp.set_colorkey(KEY_C); _PIPS[n]=stamp
+    return stamp
 
-def enemy_player_collide(player,enemies,particles,misc):
+def draw_enemy(screen,e,cx):
+    if not e['alive']: return
+    t=e['type']; r=e['rect']
+    if t=='goomba':   facing=-1; phase=(e['anim']//8)%2     # NES goombas walk by mirroring
+    elif t=='koopa':  facing=1 if (e['shell_vx'] if e['shell'] else e['vx'])>0 else -1; phase=0
+    elif t in ('hammerbro','bowser'): facing=1 if e['vx']>0 else -1; phase=0
+    else:             facing=-1; phase=0
+    screen.blit(enemy_sprite(t,r.w,r.h,e['shell'],facing,phase),(r.x-cx-ENEMY_M,r.y-ENEMY_M))
+    if t=='bowser' and e['hp']>0: screen.blit(hp_pips(e['hp']),(r.x-cx,r.y-10))
+
+def enemy_player_collide(player,foes,particles,misc):
+    """Player against the enemies in `foes` (a ColumnHash) sharing its columns."""
     if player.dead: return 0
-    score=0
-    for e in enemies:
+    score=0; pr=player.rect
+    for e in foes.query(pr.x,pr.w):
         if not e.get('alive',False): continue
         t=e['type']
         if t=='firebar':
-            if player.rect.colliderect(e['rect']): player.hit()
+            if pr.colliderect(e['rect']): player.hit()
             continue
         if t=='bowser':
-            if player.rect.colliderect(e['rect']): player.hit()
+            if pr.colliderect(e['rect']): player.hit()
             continue
-        if not player.rect.colliderect(e['rect']): continue
-        if player.vy>1 and player.rect.bottom<=e['rect'].centery+12:
+        if not pr.colliderect(e['rect']): continue
+        if player.vy>1 and pr.bottom<=e['rect'].centery+12:
             if t=='koopa' and not e['shell']:
                 e['shell']=True; e['shell_vx']=0; e['vx']=0; score+=100
             elif t=='koopa' and e['shell']:
-                kd=1 if player.rect.centerx<e['rect'].centerx else -1
+                kd=1 if pr.centerx<e['rect'].centerx else -1
                 e['shell_vx']=8*kd; play('kick')
             elif t=='hammerbro':
                 e['alive']=False; e['death_timer']=20; score+=1000
-                for _ in range(6): particles.append(Particle(e['rect'].centerx,e['rect'].centery,KOOPA_C))
+                particles.spawn(e['rect'].centerx,e['rect'].centery,KOOPA_C,6)
             else:
                 e['alive']=False; e['death_timer']=20; score+=100
-                for _ in range(4): particles.append(Particle(e['rect'].centerx,e['rect'].centery,GOOMBA_C))
+                particles.spawn(e['rect'].centerx,e['rect'].centery,GOOMBA_C,4)
             player.vy=-10; play('stomp')
         else:
             if player.star_timer>0:
@@ -755,61 +1145,413 @@ def enemy_player_collide(player,enemies,particles,misc):
     return score
 
 # ──────────────────────────────────────────────────────────────
-#  TILE RENDERER
+#  ANIMATION CLOCK  (one frame counter shared by every animation)
+# ──────────────────────────────────────────────────────────────
+class AnimClock:
+    """Counts simulation frames. Animations pick pre-baked frames from it
+    instead of reading wall-clock time, so they replay deterministically."""
+    def __init__(self): self.frame=0
+    def reset(self):    self.frame=0
+    def tick(self):     self.frame+=1
+    def index(self,hold,n):
+        """Frame index for an n-frame cycle that holds each frame `hold` ticks."""
+        return (self.frame//hold)%n
+
+ANIM = AnimClock()
+
+LAVA_HOLD = 12                        # ~200 ms per lava phase at 60 FPS
+Q_SHIMMER = (0,0,0,1,2,1); Q_HOLD = 8 # ? block colour cycle (NES-style)
+COIN_SPIN = 4                         # ticks per spinning-coin frame
+
 # ──────────────────────────────────────────────────────────────
-_fnt_sm = None
-def draw_tiles(screen,grid,cx,lt):
-    global _fnt_sm
-    if _fnt_sm is None: _fnt_sm=pygame.font.SysFont(None,int(TILE*0.7))
-    H,W=len(grid),len(grid[0])
-    c0=max(0,cx//TILE-1); c1=min(W,cx//TILE+SW//TILE+2)
+#  TEXT CACHE  (shared fonts + LRU of rendered strings)
+# ──────────────────────────────────────────────────────────────
+FONT_SM  = 26
+FONT_BIG = 60
+
+class TextCache:
+    """Owns one SysFont per size and an LRU of rendered text surfaces keyed
+    by (text, color, size). hits/misses are kept for production checks."""
+    def __init__(self,cap=256):
+        self.cap=cap; self._fonts={}; self._lru=OrderedDict()
+        self.hits=0; self.misses=0
+
+    def font(self,size):
+        f=self._fonts.get(size)
+        if f is None: f=self._fonts[size]=pygame.font.SysFont(None,size)
+        return f
+
+    def render(self,text,color,size):
+        key=(text,color,size); s=self._lru.get(key)
+        if s is not None:
+            self.hits+=1; self._lru.move_to_end(key); return s
+        self.misses+=1
+        s=self._lru[key]=self.font(size).render(text,True,color)
+        if len(self._lru)>self.cap: self._lru.popitem(last=False)
+        return s
+
+    def stats(self):
+        n=self.hits+self.misses
+        return f"text cache: {self.hits} hits / {self.misses} misses ({100*self.hits/max(1,n):.1f}% hit)"
+
+TEXT = TextCache()
+TEXT_STATS = os.environ.get('SMB_STATS','0') not in ('','0')   # print cache stats on exit
+
+# ──────────────────────────────────────────────────────────────
+#  RENDER QUEUE  (per-layer (surface,dest) lists, one blits per layer)
+# ──────────────────────────────────────────────────────────────
+RENDER_LAYERS = ('items','enemies','particles','player')
+
+_SMALL = weakref.WeakKeyDictionary()   # sprite art -> 1/LOWRES copy
+_LIVE  = weakref.WeakSet()             # surfaces redrawn in place; re-shrunk on every flush
+
+def shrink(surf,k):
+    """Nearest-neighbour 1/k copy of cached art (colorkey kept), made once."""
+    s=_SMALL.get(surf)
+    if s is None:
+        w,h=surf.get_size(); s=_SMALL[surf]=pygame.transform.scale(surf,(max(1,w//k),max(1,h//k)))
+    elif surf in _LIVE: pygame.transform.scale(surf,s.get_size(),s)
+    return s
+
+class RenderQueue:
+    """Stands in for the screen in draw code: blit()/blits() append to the
+    current layer, flush() issues a single Surface.blits per layer in order.
+    flush(dst,k) with k>1 lands the queue on a 1/k logical surface."""
+    def __init__(self,layers=RENDER_LAYERS,size=(SW,SH)):
+        self.layers={name:[] for name in layers}; self.size=size
+        self.cur=self.layers[layers[0]]; self.queued=0
+
+    def layer(self,name): self.cur=self.layers[name]; return self
+    def get_size(self): return self.size
+    def get_width(self): return self.size[0]
+    def get_height(self): return self.size[1]
+
+    def blit(self,surf,dest,area=None):
+        self.cur.append((surf,dest) if area is None else (surf,dest,area))
+
+    def blits(self,seq,doreturn=True): self.cur.extend(seq)
+
+    def flush(self,dst,k=1):
+        n=0
+        for q in self.layers.values():
+            if not q: continue
+            if k>1: q[:]=[(shrink(it[0],k),(it[1][0]//k,it[1][1]//k)) if len(it)==2 else
+                          (shrink(it[0],k),(it[1][0]//k,it[1][1]//k),[v//k for v in it[2]]) for it in q]
+            dst.blits(q,False); n+=len(q); q.clear()
+        self.queued=n
+
+# ──────────────────────────────────────────────────────────────
+#  TILE ATLAS  (every tile ID rasterized once per tile size)
+# ──────────────────────────────────────────────────────────────
+KEY_C = (255,0,255)      # colorkey for the transparent parts of cached art
+_ATLAS = {}
+
+def _raster_tile(tile,T,qc=QBLK_YLW):
+    """Draw one tile ID into its own surface. Returns (surface, x-offset).
+    The extra keyed pixel on the right/bottom keeps the 1px line overhang."""
+    lip=tile in (PIPE_TL,PIPE_TR); L=T//10   # pipe lip overhang
+    s=pygame.Surface((T+L+1 if lip else T+1,T+1)); s.fill(KEY_C)
+    rx=L if tile==PIPE_TL else 0; ry=0
+    if tile==GROUND:
+        pygame.draw.rect(s,BROWN,(rx,ry,T,T))
+        pygame.draw.rect(s,DARK_BRN,(rx,ry,T,T),2)
+        pygame.draw.line(s,DARK_BRN,(rx,ry+T//2),(rx+T,ry+T//2),1)
+        pygame.draw.line(s,DARK_BRN,(rx+T//2,ry),(rx+T//2,ry+T),1)
+    elif tile==BRICK:
+        pygame.draw.rect(s,RED_BRICK,(rx,ry,T,T))
+        pygame.draw.line(s,(240,100,30),(rx,ry+T//2),(rx+T,ry+T//2),2)
+        pygame.draw.line(s,(240,100,30),(rx+T//2,ry),(rx+T//2,ry+T//2),2)
+        pygame.draw.line(s,(240,100,30),(rx+T//4,ry+T//2),(rx+T//4,ry+T),2)
+        pygame.draw.line(s,(240,100,30),(rx+3*T//4,ry+T//2),(rx+3*T//4,ry+T),2)
+    elif tile==QBLOCK:
+        pygame.draw.rect(s,qc,(rx,ry,T,T))
+        pygame.draw.rect(s,(200,140,0),(rx,ry,T,T),3)
+        q=TEXT.render('?',BLACK,int(T*0.7))
+        s.blit(q,(rx+T//2-q.get_width()//2,ry+T//2-q.get_height()//2))
+    elif tile==USED:
+        pygame.draw.rect(s,USED_CLR,(rx,ry,T,T))
+        pygame.draw.rect(s,(100,70,30),(rx,ry,T,T),2)
+    elif tile in (PIPE_TL,PIPE_BL,PIPE_TR,PIPE_BR):
+        pygame.draw.rect(s,PIP_GRN,(rx,ry,T,T))
+        pygame.draw.rect(s,PIP_DRK,(rx,ry,T,T),3)
+        if lip:
+            pygame.draw.rect(s,PIP_GRN,(0,ry,T+L,T//2))
+            pygame.draw.rect(s,PIP_DRK,(0,ry,T+L,T//2),3)
+    elif tile==PLATFORM:
+        pygame.draw.rect(s,BROWN,(rx,ry,T,T//2))
+        pygame.draw.rect(s,DARK_BRN,(rx,ry,T,T//2),2)
+    if pygame.display.get_surface(): s=s.convert()
+    s.set_colorkey(KEY_C,pygame.RLEACCEL)
+    return s,-rx
+
+def tile_atlas(T=TILE):
+    """Tile ID -> (surface, x-offset) for tile size T, built on first use."""
+    atlas=_ATLAS.get(T)
+    if atlas is None:
+        atlas={t:_raster_tile(t,T) for t in
+               (GROUND,BRICK,QBLOCK,USED,PIPE_TL,PIPE_TR,PIPE_BL,PIPE_BR,PLATFORM)}
+        if PAL:   # the ? block shimmer becomes palette cycling, baked into the tile
+            atlas={t:(PAL.index([s]),dx) for t,(s,dx) in atlas.items()}
+            atlas[QBLOCK]=(PAL.index([_raster_tile(QBLOCK,T,c)[0] for c in Q_COLORS],'q'),0)
+        atlas[COIN_BLOCK]=atlas[STAR_BLOCK]=atlas[QBLOCK]
+        _ATLAS[T]=atlas
+    return atlas
+
+_ANIM_TILES = {}
+Q_TILES  = (QBLOCK,COIN_BLOCK,STAR_BLOCK)
+Q_COLORS = (QBLK_YLW,(232,164,16),(204,132,8))   # ? block shimmer faces
+LAVA_COLORS = (LAVA_CLR,(200,50,0))
+
+def anim_tiles(T=TILE):
+    """Pre-baked frames for animated tiles at size T: 'q' (? block shimmer)
+    and 'lava' (the two lava colours)."""
+    frames=_ANIM_TILES.get(T)
+    if frames is None:
+        q=[_raster_tile(QBLOCK,T,c)[0] for c in Q_COLORS]
+        lava=[]
+        for c in LAVA_COLORS:
+            f=pygame.Surface((T,T)); f.fill(c)
+            lava.append(f.convert() if pygame.display.get_surface() else f)
+        if PAL:   # one cycled frame per checkerboard parity
+            q=[tile_atlas(T)[QBLOCK][0]]
+            lava=[PAL.index(lava,'lava'),PAL.index(lava[::-1],'lava')]
+        frames=_ANIM_TILES[T]={'q':q,'lava':lava}
+    return frames
+
+def draw_anim_cells(screen,cells,cx,T):
+    """Blit the current frame of each animated (col,row,kind) cell."""
+    frames=anim_tiles(T)
+    if PAL: q=frames['q'][0]; lava=frames['lava']; ph=0   # indexed frames cycle by palette
+    else:
+        q=frames['q'][Q_SHIMMER[ANIM.index(Q_HOLD,len(Q_SHIMMER))]]
+        lava=frames['lava']; ph=ANIM.index(LAVA_HOLD,2)
+    screen.blits([(q if kind=='q' else lava[(col+row+ph)%2],(col*T-cx,row*T))
+                  for col,row,kind in cells],False)
+
+def anim_cells(grid,c0,c1,lava):
+    """Animated cells in columns [c0,c1): ? blocks, plus lava pits if `lava`."""
+    H=grid.shape[0]; cells=[]
     for row in range(H):
+        line=grid[row,c0:c1].tolist()
         for col in range(c0,c1):
-            tile=grid[row][col]; T=TILE
-            if tile==AIR: continue
-            rx=col*T-cx; ry=row*T
-            if tile==GROUND:
-                pygame.draw.rect(screen,BROWN,(rx,ry,T,T))
-                pygame.draw.rect(screen,DARK_BRN,(rx,ry,T,T),2)
-                pygame.draw.line(screen,DARK_BRN,(rx,ry+T//2),(rx+T,ry+T//2),1)
-                pygame.draw.line(screen,DARK_BRN,(rx+T//2,ry),(rx+T//2,ry+T),1)
-            elif tile==BRICK:
-                pygame.draw.rect(screen,RED_BRICK,(rx,ry,T,T))
-                pygame.draw.line(screen,(240,100,30),(rx,ry+T//2),(rx+T,ry+T//2),2)
-                pygame.draw.line(screen,(240,100,30),(rx+T//2,ry),(rx+T//2,ry+T//2),2)
-                pygame.draw.line(screen,(240,100,30),(rx+T//4,ry+T//2),(rx+T//4,ry+T),2)
-                pygame.draw.line(screen,(240,100,30),(rx+3*T//4,ry+T//2),(rx+3*T//4,ry+T),2)
-            elif tile in (QBLOCK,COIN_BLOCK,STAR_BLOCK):
-                pygame.draw.rect(screen,QBLK_YLW,(rx,ry,T,T))
-                pygame.draw.rect(screen,(200,140,0),(rx,ry,T,T),3)
-                s=_fnt_sm.render('?',True,BLACK)
-                screen.blit(s,(rx+T//2-s.get_width()//2,ry+T//2-s.get_height()//2))
-            elif tile==USED:
-                pygame.draw.rect(screen,USED_CLR,(rx,ry,T,T))
-                pygame.draw.rect(screen,(100,70,30),(rx,ry,T,T),2)
-            elif tile in (PIPE_TL,PIPE_BL):
-                pygame.draw.rect(screen,PIP_GRN,(rx,ry,T,T))
-                pygame.draw.rect(screen,PIP_DRK,(rx,ry,T,T),3)
-                if tile==PIPE_TL:
-                    pygame.draw.rect(screen,PIP_GRN,(rx-4,ry,T+4,T//2))
-                    pygame.draw.rect(screen,PIP_DRK,(rx-4,ry,T+4,T//2),3)
-            elif tile in (PIPE_TR,PIPE_BR):
-                pygame.draw.rect(screen,PIP_GRN,(rx,ry,T,T))
-                pygame.draw.rect(screen,PIP_DRK,(rx,ry,T,T),3)
-                if tile==PIPE_TR:
-                    pygame.draw.rect(screen,PIP_GRN,(rx,ry,T+4,T//2))
-                    pygame.draw.rect(screen,PIP_DRK,(rx,ry,T+4,T//2),3)
-            elif tile==PLATFORM:
-                pygame.draw.rect(screen,BROWN,(rx,ry,T,T//2))
-                pygame.draw.rect(screen,DARK_BRN,(rx,ry,T,T//2),2)
-    if lt=='castle':
-        tms=pygame.time.get_ticks()
+            if line[col-c0] in Q_TILES: cells.append((col,row,'q'))
+    if lava:
+        for col in range(c0,c1):
+            if grid[H-1,col]==AIR: cells+=[(col,H-2,'lava'),(col,H-1,'lava')]
+    return cells
+
+# ──────────────────────────────────────────────────────────────
+#  INDEXED COLOUR  (SMB_PALETTE=1: 8-bit backdrop, palette-cycled effects)
+# ──────────────────────────────────────────────────────────────
+PALETTE_ON = os.environ.get('SMB_PALETTE','0') not in ('','0')
+
+class IndexedPalette:
+    """One 256-colour palette shared by every 8-bit surface, so 8-bit to 8-bit
+    blits copy indices 1:1.  Pixels that differ between the frames handed to
+    index() get an entry cycled by a named clock ('q', 'lava', 'star'); the
+    SKY entry follows the level type.  live() is the palette with the current
+    phases swapped in, applied only while the backdrop is presented."""
+    KEY, SKY = 0, 1
+    CLOCKS = {'q':    lambda: Q_SHIMMER[ANIM.index(Q_HOLD,len(Q_SHIMMER))],
+              'lava': lambda: ANIM.index(LAVA_HOLD,2)}
+    def __init__(self):
+        self.colors=[KEY_C,SKY]+[BLACK]*254; self.n=2
+        self.entries={KEY_C:self.KEY}           # colour or (clock, colours) -> index
+        self.cycling={}                         # index -> (clock, colours)
+        self.surfaces=weakref.WeakSet()
+
+    def _entry(self,cols,clock):
+        cyc=clock is not None and len(set(cols))>1
+        key=(clock,cols) if cyc else cols[0]
+        i=self.entries.get(key)
+        if i is None:
+            if self.n>=256: raise RuntimeError("SMB_PALETTE: more than 256 colours")
+            i=self.entries[key]=self.n; self.n+=1; self.colors[i]=cols[0]
+            if cyc: self.cycling[i]=key
+        return i
+
+    def surface(self,size,key=True):
+        """New 8-bit surface on the shared palette, keyed and cleared if `key`."""
+        s=pygame.Surface(size,0,8); s.set_palette(self.colors); self.surfaces.add(s)
+        if key: s.fill(self.KEY); s.set_colorkey(self.KEY)
+        return s
+
+    def index(self,frames,clock=None,key=True):
+        """8-bit copy of frames[0]; pixels that vary across frames cycle with clock."""
+        W,H=frames[0].get_size(); n0=self.n
+        px=np.stack([pygame.surfarray.array3d(f).astype(np.uint32) for f in frames])
+        packed=((px[...,0]<<16)|(px[...,1]<<8)|px[...,2]).reshape(len(frames),-1).T
+        uniq,inv=np.unique(packed,axis=0,return_inverse=True)
+        lut=np.array([self._entry(tuple(((c>>16)&255,(c>>8)&255,c&255) for c in row),clock)
+                      for row in uniq.tolist()],np.uint8)
+        s=self.surface((W,H),key)
+        pygame.surfarray.pixels2d(s)[:]=lut[inv.reshape(-1)].reshape(W,H)
+        if self.n!=n0:
+            for o in self.surfaces: o.set_palette(self.colors)
+        return s
+
+    def live(self,lt):
+        cols=list(self.colors); cols[self.SKY]=lt_sky(lt)
+        ph={name:f() for name,f in self.CLOCKS.items()}
+        for i,(clock,cs) in self.cycling.items():
+            if clock in ph: cols[i]=cs[ph[clock]]
+        return cols
+
+    def phase(self,surf,clock,p):
+        """Set a surface's own entries for clock to phase p (e.g. star flash)."""
+        for i,(c,cs) in self.cycling.items():
+            if c==clock: surf.set_palette_at(i,cs[p])
+
+PAL = IndexedPalette() if PALETTE_ON else None
+
+# ──────────────────────────────────────────────────────────────
+#  LEVEL CHUNK CACHE  (pre-rendered column strips, LRU-evicted)
+# ──────────────────────────────────────────────────────────────
+CHUNK_COLS  = 16
+CHUNK_BYTES = 16*1024*1024   # resident cap; ~10 chunks of 16x15 tiles at TILE=40
+
+class ChunkCache:
+    """Level grid pre-rendered into CHUNK_COLS-wide surfaces, keyed by chunk index."""
+    def __init__(self,grid,T=TILE,lava=False,cols=CHUNK_COLS,max_bytes=CHUNK_BYTES):
+        self.grid=grid; self.T=T; self.lava=lava; self.cols=cols; self.max_bytes=max_bytes
+        self.H,self.W=grid.shape
+        self.count=(self.W+cols-1)//cols
+        self._lru=OrderedDict(); self.bytes=0; self.cells={}
+        self.renders=0; self.evictions=0
+
+    def _render(self,ci):
+        T=self.T; atlas=tile_atlas(T)
+        c0=ci*self.cols; c1=min(self.W,c0+self.cols)
+        if PAL: s=PAL.surface(((c1-c0)*T,self.H*T))
+        else:   s=pygame.Surface(((c1-c0)*T,self.H*T)); s.fill(KEY_C)
+        # one neighbour column each side keeps pipe lips / overhangs across seams
+        a0,a1=max(0,c0-1),min(self.W,c1+1)
+        for row in range(self.H):
+            ry=row*T; line=self.grid[row,a0:a1].tolist()
+            for col in range(a0,a1):
+                a=atlas.get(line[col-a0])
+                if a: s.blit(a[0],((col-c0)*T+a[1],ry))
+        cells=anim_cells(self.grid,c0,c1,self.lava)
+        if PAL:   # palette-cycled: bake lava in, nothing left to overlay per frame
+            lava=anim_tiles(T)['lava']
+            for col,row,kind in cells:
+                if kind=='lava': s.blit(lava[(col+row)%2],((col-c0)*T,row*T))
+            cells=[]
+        else:
+            if pygame.display.get_surface(): s=s.convert()
+            s.set_colorkey(KEY_C,pygame.RLEACCEL)   # static and mostly keyed: RLE skips the sky
+        self.cells[ci]=cells
+        self.renders+=1
+        return s
+
+    def get(self,ci):
+        s=self._lru.get(ci)
+        if s is not None:
+            self._lru.move_to_end(ci); return s
+        s=self._lru[ci]=self._render(ci)
+        self.bytes+=s.get_width()*s.get_height()*s.get_bytesize()
+        while self.bytes>self.max_bytes and len(self._lru)>4:
+            _,old=self._lru.popitem(last=False)
+            self.bytes-=old.get_width()*old.get_height()*old.get_bytesize()
+            self.evictions+=1
+        return s
+
+    def prime(self):
+        """Pre-render chunks from the level start until the memory cap is reached."""
+        for ci in range(self.count):
+            self.get(ci)
+            if self.bytes*(len(self._lru)+1)>self.max_bytes*len(self._lru): break
+
+    def invalidate(self,col,row):
+        """Drop the chunk(s) holding tile (col,row); they re-render on next draw."""
+        ci=col//self.cols
+        for c in {ci,(col-1)//self.cols,(col+1)//self.cols}:
+            s=self._lru.pop(c,None)
+            if s is not None: self.bytes-=s.get_width()*s.get_height()*s.get_bytesize()
+
+    def blit_span(self,dst,cx,x0,x1):
+        """Blit world-x span [x0,x1) of the level to dst, shifted left by cx."""
+        cw=self.cols*self.T
+        for ci in range(max(0,x0//cw),min(self.count,(x1-1)//cw+1)):
+            a=max(x0,ci*cw); b=min(x1,(ci+1)*cw)
+            dst.blit(self.get(ci),(a-cx,0),(a-ci*cw,0,b-a,self.H*self.T))
+
+    def draw_anim(self,screen,cx,view_w=SW):
+        """Overlay animated tiles (? blocks, lava) of the visible chunks."""
+        cw=self.cols*self.T
+        for ci in range(max(0,cx//cw),min(self.count,(cx+view_w-1)//cw+1)):
+            if ci not in self._lru: self.get(ci)
+            draw_anim_cells(screen,self.cells[ci],cx,self.T)
+
+    def draw(self,screen,cx,view_w=SW):
+        self.blit_span(screen,cx,cx,cx+view_w); self.draw_anim(screen,cx,view_w)
+
+# ──────────────────────────────────────────────────────────────
+#  SCROLL LAYER  (persistent tile framebuffer, NES-style column updates)
+# ──────────────────────────────────────────────────────────────
+# SMB_SCROLL=1 draws tiles through a view-sized layer that keeps the previous
+# frame and Surface.scroll()s it by the camera delta. Off by default: its one
+# full-view colorkeyed blit a frame can't be RLE'd (the surface changes every
+# frame) and measures ~10x the RLE chunk blits on software surfaces.
+SCROLL_ON = os.environ.get('SMB_SCROLL','0') not in ('','0')
+
+class ScrollLayer:
+    """View-sized tile layer that is shifted by the camera delta each frame.
+    Only the newly exposed strip and invalidated columns are re-painted, from
+    the RLE chunks of a ChunkCache."""
+    def __init__(self,chunks,view_w=SW):
+        self.chunks=chunks; self.w=view_w; self.h=chunks.H*chunks.T
+        if PAL: self.surf=PAL.surface((self.w,self.h))
+        else:
+            self.surf=pygame.Surface((self.w,self.h))
+            if pygame.display.get_surface(): self.surf=self.surf.convert()
+            self.surf.set_colorkey(KEY_C)
+        self.cx=None; self.dirty=[]; self.painted=0
+
+    def prime(self): self.chunks.prime()
+
+    def _paint(self,x0,x1):
+        a=max(0,x0-self.cx); b=min(self.surf.get_width(),x1-self.cx)
+        if b<=a: return
+        self.surf.set_clip((a,0,b-a,self.h)); self.surf.fill(KEY_C)
+        self.chunks.blit_span(self.surf,self.cx,a+self.cx,b+self.cx)
+        self.surf.set_clip(None); self.painted+=b-a
+
+    def invalidate(self,col,row):
+        """Mark tile (col,row) changed; neighbours are repainted for lips/overhangs."""
+        self.chunks.invalidate(col,row)
+        T=self.chunks.T; self.dirty.append(((col-1)*T,(col+2)*T))
+
+    def update(self,cx):
+        if self.cx is None or abs(cx-self.cx)>=self.w:
+            self.cx=cx; self._paint(cx,cx+self.w)
+        elif cx!=self.cx:
+            d=cx-self.cx; self.surf.scroll(-d,0); self.cx=cx
+            if d>0: self._paint(cx+self.w-d,cx+self.w)
+            else:   self._paint(cx,cx-d)
+        for x0,x1 in self.dirty: self._paint(x0,x1)
+        self.dirty.clear()
+
+    def draw(self,screen,cx,view_w=None):
+        self.update(cx); screen.blit(self.surf,(0,0))
+        self.chunks.draw_anim(screen,cx,self.w)
+
+# ──────────────────────────────────────────────────────────────
+#  TILE RENDERER
+# ──────────────────────────────────────────────────────────────
+def draw_tiles(screen,grid,cx,lt,tilemap=None,T=TILE):
+    """Tiles in view; `tilemap` (ChunkCache or ScrollLayer) replaces the per-tile atlas path."""
+    if tilemap: tilemap.draw(screen,cx,screen.get_width()); return
+    H,W=grid.shape
+    c0=max(0,cx//T-1); c1=min(W,cx//T+screen.get_width()//T+2)
+    atlas=tile_atlas(T); batch=[]
+    for row in range(H):
+        ry=row*T; line=grid[row,c0:c1].tolist()
         for col in range(c0,c1):
-            if col<W and grid[H-1][col]==AIR:
-                for row in range(H-2,H):
-                    rx2=col*TILE-cx; ry2=row*TILE
-                    lc=LAVA_CLR if (col+row+tms//200)%2==0 else (200,50,0)
-                    pygame.draw.rect(screen,lc,(rx2,ry2,TILE,TILE))
+            a=atlas.get(line[col-c0])
+            if a: batch.append((a[0],(col*T-cx+a[1],ry)))
+    screen.blits(batch,False)
+    draw_anim_cells(screen,anim_cells(grid,c0,c1,lt=='castle'),cx,T)
 
 # ──────────────────────────────────────────────────────────────
 #  FLAGPOLE
@@ -821,8 +1563,7 @@ class Flagpole:
         self.clear_t=0; self._bonus=0
 
     def check(self,player):
-        pr=pygame.Rect(self.x,self.top_y,8,self.bot_y-self.top_y)
-        if player.rect.colliderect(pr) and not self.sliding:
+        if not self.sliding and hits(player.rect,self.x,self.top_y,8,self.bot_y-self.top_y):
             self.sliding=True; player.vx=0
             ratio=1.0-max(0,min(1,(player.y-self.top_y)/(self.bot_y-self.top_y-32)))
             self._bonus=max(500,int(ratio*5000//500)*500)
@@ -836,123 +1577,498 @@ class Flagpole:
             if player.y>=self.bot_y-player.h:
                 player.y=self.bot_y-player.h; self.done=True; self.clear_t=150; play('clear')
 
-    def draw(self,screen,cx):
-        rx=self.x-cx
-        pygame.draw.rect(screen,(150,150,150),(rx,self.top_y,6,self.bot_y-self.top_y))
-        pygame.draw.rect(screen,FLAG_C,(rx-24,self.flag_y,24,16))
-        pygame.draw.circle(screen,(255,215,0),(rx+3,self.top_y),6)
+    def draw(self,screen,cx,k=1):
+        rx=(self.x-cx)//k; top=self.top_y//k
+        screen.fill((150,150,150),(rx,top,max(1,6//k),(self.bot_y-self.top_y)//k))
+        screen.fill(FLAG_C,(rx-24//k,self.flag_y//k,24//k,16//k))
+        screen.blit(disc((255,215,0),max(1,6//k)),(rx-3//k,top-6//k))
 
 # ──────────────────────────────────────────────────────────────
 #  BACKGROUND DECORATIONS
 # ──────────────────────────────────────────────────────────────
-def draw_bg(screen,lt,cx):
+# Overworld layers are baked as horizontally tileable strips: the content
+# repeats every `period` px and is pre-shifted by the old draw margin, so a
+# single area-blit at (cx//rate) % period reproduces the per-ellipse layout.
+_BG = {}
+
+def _bake_strip(period,margin,y0,h,shapes,k):
+    """shapes: (color, x, y, w, h) ellipses at strip offset x in [0,period)."""
+    s=pygame.Surface(((period+SW)//k,h//k)); s.fill(KEY_C)
+    for col,x,y,w,hh in shapes:
+        for rep in (-1,0,1,2):
+            ex=x-margin+rep*period
+            if ex+w>0 and ex<period+SW:
+                pygame.draw.ellipse(s,col,(ex//k,(y-y0)//k,w//k,hh//k))
+    if pygame.display.get_surface(): s=s.convert()
+    s.set_colorkey(KEY_C,pygame.RLEACCEL)
+    return s
+
+def bg_layers(lt,k=1):
+    """(sky color or baked sky surface, [(strip, period, rate, y)]) per level type."""
+    key=(lt,k); L=_BG.get(key)
+    if L is not None: return L
+    sky=lt_sky(lt); strips=[]
     if lt=='overworld':
+        clouds=[]
         for i in range(20):
-            ox=(i*320-cx//3)%(SW+400)-200; oy=50+(i%3)*20
-            pygame.draw.ellipse(screen,WHITE,(ox,oy,100,40))
-            pygame.draw.ellipse(screen,WHITE,(ox+20,oy-15,70,35))
-            pygame.draw.ellipse(screen,WHITE,(ox+50,oy-5,80,40))
-        for i in range(12):
-            hx=(i*420-cx//4)%(SW+600)-300
-            pygame.draw.ellipse(screen,(80,180,60),(hx,SH-100-(i%2)*30,220,100))
+            ox=(i*320)%(SW+400); oy=50+(i%3)*20
+            clouds+=[(WHITE,ox,oy,100,40),(WHITE,ox+20,oy-15,70,35),(WHITE,ox+50,oy-5,80,40)]
+        strips.append((_bake_strip(SW+400,200,35,96,clouds,k),SW+400,3,35//k))
+        hills=[((80,180,60),(i*420)%(SW+600),SH-100-(i%2)*30,220,100) for i in range(12)]
+        strips.append((_bake_strip(SW+600,300,SH-130,130,hills,k),SW+600,4,(SH-130)//k))
     elif lt in ('castle','underground'):
+        stars=pygame.Surface((SW//k,SH//k)); stars.fill(KEY_C if PAL else sky)
         rng2=random.Random(42)
         for _ in range(60):
-            pygame.draw.circle(screen,WHITE,(rng2.randint(0,SW),rng2.randint(0,SH-80)),1)
-    elif lt=='underwater':
-        tms=pygame.time.get_ticks()//100
+            pygame.draw.circle(stars,WHITE,(rng2.randint(0,SW)//k,rng2.randint(0,SH-80)//k),1)
+        if PAL: strips.append((stars,1,1,0))   # period 1: a fixed layer over the sky entry
+        else: sky=stars.convert() if pygame.display.get_surface() else stars
+    if PAL: sky=PAL.SKY; strips=[(PAL.index([st]),p,r,y) for st,p,r,y in strips]
+    L=_BG[key]=(sky,strips)
+    return L
+
+def draw_bg(screen,lt,cx,k=1):
+    """Sky plus background decorations; k is the render downscale factor (SMB_LOWRES)."""
+    sky,strips=bg_layers(lt,k)
+    if isinstance(sky,pygame.Surface): screen.blit(sky,(0,0))
+    else: screen.fill(sky)
+    for strip,period,rate,y in strips:
+        screen.blit(strip,(0,y),(((cx//rate)%period)//k,0,screen.get_width(),strip.get_height()))
+    if lt=='underwater':
+        tms=ANIM.frame//6   # 100 ms steps at 60 FPS
+        r=max(1,4//k); ring=disc((100,180,255),r,1)
         for i in range(15):
             bx=(i*57+tms*2)%SW; by=SH-(i*40+tms*3)%(SH-80)
-            pygame.draw.circle(screen,(100,180,255),(bx,by),4,1)
+            screen.blit(ring,(bx//k-r,by//k-r))
 
 # ──────────────────────────────────────────────────────────────
 #  HUD + SCREENS
 # ──────────────────────────────────────────────────────────────
-def draw_hud(screen,world,lnum,score,coins,lives,timer,font):
-    pygame.draw.rect(screen,BLACK,(0,0,SW,36))
-    tc=WHITE if timer>100 else (255,80,80)
-    txt=f"W{world}-{lnum}  SCORE:{score:07d}  COINS:{coins:02d}  x{lives}  TIME:{int(timer):03d}"
-    screen.blit(font.render(txt,True,WHITE),(10,8))
-    tip=font.render("N=skip  R=restart  B=world(title)  ESC=quit  X/Shift=run  Z/Ctrl=fire",True,(70,70,70))
-    screen.blit(tip,(SW//2-tip.get_width()//2,SH-20))
-
-def _center(screen,s,y): screen.blit(s,(SW//2-s.get_width()//2,y))
-
-def draw_title(screen,big,font,wsel):
-    screen.fill(BLACK)
-    _center(screen,big.render("SUPER MARIO BROS",True,WHITE),130)
-    for txt,col,y in [
-        ("Enhanced Recreation  —  Worlds 1-1 through 8-4", QBLK_YLW, 210),
-        ("Arrows/WASD=Move  Space=Jump  X/Shift=Run  Z/Ctrl=Fire", (180,180,180), 265),
-        (f"World Select: {wsel+1}  (press B to change)", COIN_YLW, 315),
-        ("Press ENTER or SPACE to start", WHITE, 390),
-    ]:
-        _center(screen,font.render(txt,True,col),y)
-
-def draw_gameover(screen,big,font):
-    screen.fill(BLACK)
-    _center(screen,big.render("GAME OVER",True,WHITE),220)
-    _center(screen,font.render("Press ENTER to return to title",True,(180,180,180)),330)
-
-def draw_worldclear(screen,big,font,w):
-    screen.fill(BLACK)
-    _center(screen,big.render(f"WORLD {w} CLEAR!",True,QBLK_YLW),200)
-    _center(screen,font.render("Press ENTER to continue",True,WHITE),310)
-
-def draw_victory(screen,big,font):
-    screen.fill(BLACK)
-    _center(screen,big.render("YOU WIN!",True,QBLK_YLW),180)
-    _center(screen,font.render("Congratulations! All 8 worlds completed!",True,WHITE),280)
-    _center(screen,font.render("Press ENTER to play again",True,(180,180,180)),360)
+class Hud:
+    """HUD strip composed from per-field surfaces (level, score, coins, lives,
+    time). A field is re-rasterized only when its displayed text changes; the
+    fields after it are re-blitted in case its width changed."""
+    TIP="N=skip  R=restart  B=world(title)  ESC=quit  X/Shift=run  Z/Ctrl=fire"
+    def __init__(self):
+        self.strip=pygame.Surface((SW,36)); self.strip.fill(BLACK)
+        self.gap=TEXT.font(FONT_SM).size("  ")[0]
+        self.text=[None]*5; self.surf=[None]*5; self.xs=[10]*5; self.renders=0
+        self.tip=TEXT.render(self.TIP,(70,70,70),FONT_SM)
+        self.tip_pos=(SW//2-self.tip.get_width()//2,SH-20)
+
+    def _compose(self,i):
+        x=self.xs[i]; self.strip.fill(BLACK,(x,0,SW-x,36))
+        for j in range(i,5):
+            self.xs[j]=x; self.strip.blit(self.surf[j],(x,8))
+            x+=self.surf[j].get_width()+self.gap
+
+    def draw(self,screen,world,lnum,score,coins,lives,timer):
+        first=None
+        for i,t in enumerate((f"W{world}-{lnum}",f"SCORE:{score:07d}",f"COINS:{coins:02d}",
+                              f"x{lives}",f"TIME:{int(timer):03d}")):
+            if t==self.text[i]: continue
+            self.text[i]=t; self.surf[i]=TEXT.render(t,WHITE,FONT_SM); self.renders+=1
+            if first is None: first=i
+        if first is not None: self._compose(first)
+        screen.blit(self.strip,(0,0))
+        screen.blit(self.tip,self.tip_pos)
+
+def _center(screen,s,y):
+    w,h=s.get_size(); r=new_rect(SW//2-w//2,y,w,h); screen.blit(s,r); return r
+
+# Static screens are described as (size, text, color, y) lines so that only
+# the lines whose content changed need to be re-rendered and re-presented.
+def title_lines(wsel):
+    return [(FONT_BIG,"SUPER MARIO BROS",WHITE,130),
+            (FONT_SM,"Enhanced Recreation  —  Worlds 1-1 through 8-4",QBLK_YLW,210),
+            (FONT_SM,"Arrows/WASD=Move  Space=Jump  X/Shift=Run  Z/Ctrl=Fire",(180,180,180),265),
+            (FONT_SM,f"World Select: {wsel+1}  (press B to change)",COIN_YLW,315),
+            (FONT_SM,"Press ENTER or SPACE to start",WHITE,390)]
+
+def gameover_lines():
+    return [(FONT_BIG,"GAME OVER",WHITE,220),
+            (FONT_SM,"Press ENTER to return to title",(180,180,180),330)]
+
+def worldclear_lines(w):
+    return [(FONT_BIG,f"WORLD {w} CLEAR!",QBLK_YLW,200),
+            (FONT_SM,"Press ENTER to continue",WHITE,310)]
+
+def victory_lines():
+    return [(FONT_BIG,"YOU WIN!",QBLK_YLW,180),
+            (FONT_SM,"Congratulations! All 8 worlds completed!",WHITE,280),
+            (FONT_SM,"Press ENTER to play again",(180,180,180),360)]
+
+# ──────────────────────────────────────────────────────────────
+#  IDLE PRESENTATION  (static screens drawn once, dirty-rect updates)
+# ──────────────────────────────────────────────────────────────
+IDLE_WAIT_MS = 500   # event.wait timeout on static screens with no music due
+
+class StaticScreen:
+    """Cached surface for the current static screen. A new screen is rendered
+    and flipped once; afterwards only changed lines are redrawn and updated."""
+    def __init__(self):
+        self.surf=pygame.Surface((SW,SH)); self.kind=None; self.shown=[]
+
+    def reset(self): self.kind=None
+
+    def present(self,rend,kind,lines):
+        screen=rend.target
+        if kind!=self.kind or len(lines)!=len(self.shown):
+            self.surf.fill(BLACK)
+            self.shown=[(ln,_center(self.surf,TEXT.render(ln[1],ln[2],ln[0]),ln[3])) for ln in lines]
+            self.kind=kind; screen.blit(self.surf,(0,0)); rend.present(); return
+        dirty=[]
+        for i,(ln,(old,r)) in enumerate(zip(lines,self.shown)):
+            if ln==old: continue
+            self.surf.fill(BLACK,r)
+            nr=_center(self.surf,TEXT.render(ln[1],ln[2],ln[0]),ln[3])
+            self.shown[i]=(ln,nr); r.union_ip(nr); dirty.append(r)
+        for r in dirty: screen.blit(self.surf,r,r)
+        if dirty: rend.update(dirty)
+
+def idle_wait():
+    """Block until an event arrives or the next music note is due."""
+    due=MUSIC.due_ms()
+    ev=pygame.event.wait(IDLE_WAIT_MS if due is None else due)
+    return ([ev] if ev.type!=pygame.NOEVENT else [])+pygame.event.get()
+
+# ──────────────────────────────────────────────────────────────
+#  CAMERA CULLING  (world-x rejection before any draw work)
+# ──────────────────────────────────────────────────────────────
+CULL_PAD   = ENEMY_M   # widest art overhang past a hitbox
+DEBUG_FONT = 20
+
+class Culler:
+    """Viewport test on world-x spans; counts drawn/culled per frame."""
+    def __init__(self,view_w=SW,pad=CULL_PAD):
+        self.view_w=view_w; self.pad=pad; self.x0=self.x1=0; self.drawn=self.culled=0
+
+    def begin(self,cx):
+        self.x0=cx-self.pad; self.x1=cx+self.view_w+self.pad; self.drawn=self.culled=0
+
+    def visible(self,x,w):
+        if x+w>self.x0 and x<self.x1: self.drawn+=1; return True
+        self.culled+=1; return False
+
+    def count(self,drawn,total): self.drawn+=drawn; self.culled+=total-drawn
+
+def draw_debug(screen,lines,y=40):
+    """F3 overlay: plain text lines under the HUD strip. Returns the next free y."""
+    for ln in lines:
+        s=TEXT.render(ln,WHITE,DEBUG_FONT); w,h=s.get_size()
+        screen.fill(BLACK,(5,y-1,w+6,h+2)); screen.blit(s,(8,y)); y+=h+2
+    return y
+
+# ──────────────────────────────────────────────────────────────
+#  PERF OVERLAY  (F3: per-phase timings, frame-time histogram, p99)
+# ──────────────────────────────────────────────────────────────
+PERF_PHASES  = ('events','player','enemies','collide','update','bg','tiles','entities','hud','flip')
+P_EVENTS,P_PLAYER,P_ENEMIES,P_COLLIDE,P_UPDATE,P_BG,P_TILES,P_ENTITIES,P_HUD,P_FLIP = range(len(PERF_PHASES))
+PERF_WINDOW  = 240                        # frames of rolling history
+PERF_REFRESH = 15                         # overlay text is re-rendered this often
+PERF_BINS    = (8,12,16,20,25,33,50)      # histogram bucket upper edges (ms)
+
+class Perf:
+    """Rolling frame profiler. While hidden, begin() only counts dropped frames
+    and mark() is a single attribute test, so it stays in release builds."""
+    def __init__(self,budget_ms=1000/FPS):
+        self.on=False; self.budget=budget_ms; self.dropped=0
+        self.phase=np.zeros((PERF_WINDOW,len(PERF_PHASES))); self.frame=np.zeros(PERF_WINDOW)
+        self.i=self.n=0; self.row=self.phase[0]; self.last=0.0; self.lines=[]
+
+    def toggle(self):
+        self.on=not self.on; self.i=self.n=0; self.lines=[]
+        self.phase[:]=0; self.frame[:]=0; self.last=time.perf_counter()
+
+    def begin(self,ms):
+        """Start a frame; ms is the interval the clock just measured."""
+        if ms>1.5*self.budget: self.dropped+=1
+        if not self.on: return
+        self.row=self.phase[self.i]; self.row[:]=0; self.frame[self.i]=ms
+        self.i=(self.i+1)%PERF_WINDOW; self.n=min(self.n+1,PERF_WINDOW)
+        self.last=time.perf_counter()
+
+    def mark(self,k):
+        """Charge the time since the previous mark to phase k."""
+        if self.on:
+            t=time.perf_counter(); self.row[k]+=(t-self.last)*1000; self.last=t
+
+    def _refresh(self,extra):
+        n=max(1,self.n); fr=self.frame[:n]; avg=self.phase[:n].mean(axis=0)   # slots [0,n) are written
+        mean=fr.mean() or self.budget
+        self.lines=[f"frame {mean:.1f} ms  p99 {np.percentile(fr,99):.1f}  "
+                    f"{1000/mean:.0f} fps  dropped {self.dropped}",
+                    f"work {avg.sum():.2f} ms"]
+        self.lines+=[f"{name:<9}{ms:6.2f}" for name,ms in zip(PERF_PHASES,avg)]
+        self.lines+=extra
+        self.hist=np.bincount(np.searchsorted(PERF_BINS,fr),minlength=len(PERF_BINS)+1)
+
+    def draw(self,screen,extra):
+        """Text block plus frame-time histogram; extra lines are appended as-is."""
+        if not self.lines or self.i%PERF_REFRESH==0: self._refresh(extra)
+        y=draw_debug(screen,self.lines)+4
+        top=max(1,int(self.hist.max())); bw=24; bh=40
+        screen.fill(BLACK,(4,y-2,bw*len(self.hist)+8,bh+22))
+        for j,c in enumerate(self.hist.tolist()):
+            h=max(1,bh*c//top) if c else 0; col=FLAG_C if j<3 else (QBLK_YLW if j<5 else RED)
+            if h: screen.fill(col,(8+j*bw,y+bh-h,bw-4,h))
+            lbl=TEXT.render(str(PERF_BINS[j]) if j<len(PERF_BINS) else "+",WHITE,DEBUG_FONT-6)
+            screen.blit(lbl,(8+j*bw,y+bh+2))
+
+# ──────────────────────────────────────────────────────────────
+#  FRAME CAPTURE  (SMB_CAPTURE=<dir> for BMP frames, <file>.rgb for raw RGB24)
+# ──────────────────────────────────────────────────────────────
+CAPTURE      = os.environ.get('SMB_CAPTURE','')
+CAPTURE_RING = 8     # preallocated frame buffers between game and writer
+
+class FrameCapture:
+    """Copies each presented frame into a free ring slot and lets a writer
+    thread encode it. With no free slot the capture frame is dropped, never
+    the game frame."""
+    def __init__(self,path,size=(SW,SH),ring=CAPTURE_RING):
+        self.path=path; self.raw=path.endswith('.rgb'); self.size=size
+        if self.raw: self.out=open(path,'wb')
+        else: os.makedirs(path,exist_ok=True)
+        W,H=size; n=max(W*H*4,W*H*3)
+        self.slots=[np.empty(n,np.uint8) for _ in range(ring)]
+        self.free=queue.Queue(); self.work=queue.Queue()
+        for i in range(ring): self.free.put(i)
+        self.frames=self.written=self.dropped=self.bytes=0; self.busy=0.0
+        self.t0=time.perf_counter()
+        self.thread=threading.Thread(target=self._writer,daemon=True); self.thread.start()
+
+    def grab(self,surf):
+        """Queue surf (the finished frame) for writing; cheap on the game thread."""
+        self.frames+=1
+        try: i=self.free.get_nowait()
+        except queue.Empty: self.dropped+=1; return
+        slot=self.slots[i]; W,H=self.size
+        if surf.get_bytesize()==4 and surf.get_pitch()==W*4 and sys.byteorder=='little':
+            view=surf.get_buffer(); slot[:W*H*4]=np.frombuffer(view,np.uint8); del view
+            fmt=tuple(sh//8 for sh in surf.get_shifts()[:3])   # byte offset of R,G,B
+        else:
+            slot[:W*H*3]=np.frombuffer(pygame.image.tobytes(surf,'RGB'),np.uint8); fmt=None
+        self.work.put((i,self.frames,fmt))
+
+    def _writer(self):
+        W,H=self.size; rgb=np.empty((H,W,3),np.uint8)
+        while True:
+            job=self.work.get()
+            if job is None: return
+            i,n,fmt=job; t=time.perf_counter(); slot=self.slots[i]
+            if fmt:
+                px=slot[:W*H*4].reshape(H,W,4)
+                for c in range(3): rgb[:,:,c]=px[:,:,fmt[c]]
+            else: rgb[:]=slot[:W*H*3].reshape(H,W,3)
+            self.free.put(i)
+            if self.raw: self.out.write(rgb)
+            else: pygame.image.save(pygame.image.frombuffer(rgb,(W,H),'RGB'),
+                                    os.path.join(self.path,f"frame_{n:06d}.bmp"))
+            self.written+=1; self.bytes+=rgb.nbytes; self.busy+=time.perf_counter()-t
+
+    def close(self):
+        """Flush queued frames, stop the writer and return a summary line."""
+        self.work.put(None); self.thread.join()
+        if self.raw: self.out.close()
+        wall=max(1e-6,time.perf_counter()-self.t0); W,H=self.size
+        return (f"capture: {self.written}/{self.frames} frames {W}x{H} to {self.path}, "
+                f"{self.dropped} dropped, {self.written/wall:.1f} fps, "
+                f"{self.bytes/max(1e-6,self.busy)/2**20:.0f} MB/s writer")
+
+# ──────────────────────────────────────────────────────────────
+#  DISPLAY BACKENDS  (SMB_BACKEND=window | sdl2 | offscreen | null)
+# ──────────────────────────────────────────────────────────────
+# 'window' draws into the software display surface.  'sdl2' keeps every cached
+# surface as a pygame._sdl2 Texture and composites on a Renderer (GPU when
+# available, SDL's software renderer otherwise), scaled up SMB_SCALE times.
+# 'offscreen' draws into a plain Surface and hands each frame out as a NumPy
+# array; 'null' skips drawing altogether.  Neither opens a window, so both
+# run under SDL_VIDEODRIVER=dummy.
+BACKEND = os.environ.get('SMB_BACKEND','window')
+SCALE   = max(1,int(os.environ.get('SMB_SCALE','1') or 1))
+CAPTION = "Super Mario Bros — Enhanced (1-1 to 8-4)"
+
+class Renderer:
+    """Backend interface. target is what draw code blits to (a Surface, or an
+    object with its blit/blits/fill/get_size); present() ends a frame and
+    update(rects) ends a partial one.  draws=False makes main() skip drawing."""
+    draws=True
+    def stream(self,surf): pass
+    def surface(self): return self.target
+    def upscale(self,src):
+        t=self.target; size=t.get_size()
+        if src.get_size()==size: t.blit(src,(0,0))
+        elif src.get_bitsize()==t.get_bitsize(): pygame.transform.scale(src,size,t)
+        else: t.blit(pygame.transform.scale(src,size),(0,0))
+    def present(self): pass
+    def update(self,rects): self.present()
+
+class WindowRenderer(Renderer):
+    """Plain pygame window; the draw target is the display surface."""
+    def __init__(self,size=(SW,SH)):
+        self.target=pygame.display.set_mode(size); pygame.display.set_caption(CAPTION)
+    def present(self): pygame.display.flip()
+    def update(self,rects): pygame.display.update(rects)
+
+class NullRenderer(Renderer):
+    """Simulation only: main() never draws, target is a scratch surface."""
+    draws=False
+    def __init__(self,size=(SW,SH)): self.target=pygame.Surface(size)
+
+class OffscreenRenderer(Renderer):
+    """Draws into an off-screen Surface. on_frame, if given, receives every
+    presented frame as an (H, W, 3) uint8 array; frame() returns the last one."""
+    def __init__(self,size=(SW,SH),on_frame=None):
+        self.target=pygame.Surface(size); self.on_frame=on_frame; self.frames=0
+    def frame(self): return pygame.surfarray.array3d(self.target).swapaxes(0,1)
+    def present(self):
+        self.frames+=1
+        if self.on_frame: self.on_frame(self.frame())
+
+class Sdl2Renderer(Renderer):
+    """Texture/Renderer backend. It is its own draw target: the blit/blits/fill/
+    get_size subset of the Surface API the draw code uses, mapped onto cached
+    Textures.  Frames are composed in a target texture so partial updates keep
+    the rest of the frame, then scaled to the window on present()."""
+    def __init__(self,size=(SW,SH),scale=SCALE):
+        from pygame._sdl2 import video
+        self.video=video; self.size=size
+        self.window=video.Window(CAPTION,size=(size[0]*scale,size[1]*scale))
+        try: self.ren=video.Renderer(self.window,accelerated=1)
+        except video.error:
+            print("sdl2: no accelerated renderer, using software")
+            self.ren=video.Renderer(self.window,accelerated=0)
+        self.frame=video.Texture(self.ren,size,target=True); self.ren.target=self.frame
+        self.target=self
+        self._tex=weakref.WeakKeyDictionary()      # immutable art -> Texture
+        self._streams=weakref.WeakKeyDictionary()  # surfaces redrawn in place -> streaming Texture
+
+    def stream(self,surf):
+        """Mark a surface that is modified in place; it is re-uploaded on every blit."""
+        self._streams[surf]=self.video.Texture(self.ren,surf.get_size(),streaming=True)
+
+    def _texture(self,surf):
+        tex=self._streams.get(surf)
+        if tex is not None: tex.update(surf if surf.get_bitsize()==32 else surf.convert(32)); return tex
+        tex=self._tex.get(surf)
+        if tex is None: tex=self._tex[surf]=self.video.Texture.from_surface(self.ren,surf)
+        return tex
+
+    def get_size(self): return self.size
+    def get_width(self): return self.size[0]
+    def get_height(self): return self.size[1]
+
+    def blit(self,surf,dest,area=None):
+        x,y=dest[0],dest[1]
+        if area is None: self._texture(surf).draw(None,(x,y)); return
+        ax,ay,aw,ah=area; sw,sh=surf.get_size()
+        x0=max(ax,0); y0=max(ay,0); w=min(ax+aw,sw)-x0; h=min(ay+ah,sh)-y0
+        if w>0 and h>0: self._texture(surf).draw((x0,y0,w,h),(x+x0-ax,y+y0-ay,w,h))
+
+    def blits(self,seq,doreturn=True):
+        for item in seq: self.blit(*item)
+
+    def fill(self,color,rect=None):
+        self.ren.draw_color=pygame.Color(color)
+        self.ren.fill_rect(rect if rect is not None else (0,0)+self.size)
+
+    def upscale(self,src): self._texture(src).draw(None,(0,0)+self.size)
+
+    def surface(self): return self.ren.to_surface()   # GPU readback of the frame texture
+
+    def present(self):
+        self.ren.target=None
+        self.frame.draw(None,(0,0)+self.window.size); self.ren.present()
+        self.ren.target=self.frame
+
+def make_renderer(backend=None):
+    backend=backend or BACKEND
+    if backend=='null':      return NullRenderer()
+    if backend=='offscreen': return OffscreenRenderer()
+    if backend=='sdl2':
+        try: return Sdl2Renderer()
+        except (ImportError,RuntimeError,pygame.error) as e:   # _sdl2 errors are RuntimeErrors
+            print(f"SMB_BACKEND=sdl2 unavailable ({e}); using the window backend")
+    elif backend!='window': print(f"unknown SMB_BACKEND={backend!r}; using the window backend")
+    return WindowRenderer()
 
 # ──────────────────────────────────────────────────────────────
 #  MAIN
 # ──────────────────────────────────────────────────────────────
-def main():
-    screen=pygame.display.set_mode((SW,SH))
-    pygame.display.set_caption("Super Mario Bros — Enhanced (1-1 to 8-4)")
+def main(rend=None):
+    """Run the game on rend (default: the SMB_BACKEND renderer)."""
+    rend=rend or make_renderer(); screen=rend.target
     clock=pygame.time.Clock()
-    font=pygame.font.SysFont(None,26); big=pygame.font.SysFont(None,60)
 
     STATE='title'; world=1; lnum=1
     score=0; coins=0; lives=3; world_sel=0
 
-    grid=None; LW=0; player=None
-    enemies=[]; particles=[]; coin_anims=[]; powerups=[]; fireballs=[]; misc=[]
+    grid=None; LW=0; player=None; tilemap=None
+    enemies=[]; spawner=None; particles=Particles(); coin_anims=[]; powerups=[]; fireballs=[]; misc=[]
     flagpole=None; cam=0; ltimer=400.0; bumped=[]
 
-    # Optional: frame time monitor
-    # frame_times = []
-
     def load(w,l):
-        nonlocal grid,LW,player,enemies,particles,coin_anims
+        nonlocal grid,LW,player,tilemap,enemies,spawner,coin_anims
         nonlocal powerups,fireballs,misc,flagpole,cam,ltimer,bumped
         grid,LW=build_level(w,l)
-        H=len(grid)
+        tilemap=None
+        if rend.draws:
+            tilemap=ChunkCache(grid,RTILE,LEVEL_TYPE[(w,l)]=='castle')
+            if SCROLL_ON and isinstance(backdrop,pygame.Surface): tilemap=ScrollLayer(tilemap,RW)
+            tilemap.prime()
+        ANIM.reset()
+        H=grid.shape[0]
         player=Player(2*TILE,(H-4)*TILE)
-        enemies=spawn_enemies(grid,w,l,LW)
-        particles=[]; coin_anims=[]; powerups=[]; fireballs=[]; misc=[]
+        enemies=[]; spawner=EnemySpawner(spawn_enemies(grid,w,l,LW))
+        particles.clear(); coin_anims=[]; powerups=[]; fireballs=[]; misc=[]; foes.clear()
         flagpole=Flagpole((LW-4)*TILE,H)
         cam=0; ltimer=400.0; bumped=[]
         MUSIC.set(lt_music(LEVEL_TYPE[(w,l)]))
 
+    def set_tile(col,row,tile):
+        grid.set_tile(col,row,tile)
+        if tilemap: tilemap.invalidate(col,row)
+
+    # surfaces below are only built when something will actually be drawn
+    static=hud=backdrop=scene=None; cull=Culler(); perf=Perf()
+    foes=ColumnHash(); shots=ColumnHash()
+    cap=FrameCapture(CAPTURE) if CAPTURE and rend.draws else None
+    rq=RenderQueue()
+    if rend.draws:
+        static=StaticScreen(); hud=Hud()
+        if PAL: backdrop=PAL.surface((RW,RH),key=False)
+        else:
+            backdrop=screen if LOWRES==1 else pygame.Surface((RW,RH))
+            if backdrop is not screen and pygame.display.get_surface(): backdrop=backdrop.convert()
+        # scene: where sprites land -- the screen, or the 1/LOWRES logical
+        # surface (an RGB copy of the indexed backdrop under SMB_PALETTE)
+        scene=screen if LOWRES==1 else (pygame.Surface((RW,RH)) if PAL else backdrop)
+        rend.stream(static.surf); rend.stream(hud.strip); rend.stream(particles.layer)
+        up=scene if LOWRES>1 else backdrop   # only a low-res/indexed surface is uploaded
+        if up is not screen: rend.stream(up)
     running=True
     while running:
-        dt=min(clock.tick(FPS)/1000.0, 1/30.0)
+        idle=STATE in ('title','gameover','worldclear','victory')
+        if idle:
+            if STATE=='title':       lines=title_lines(world_sel)
+            elif STATE=='gameover':  lines=gameover_lines()
+            elif STATE=='worldclear':lines=worldclear_lines(world)
+            else:                    lines=victory_lines()
+            if rend.draws: static.present(rend,STATE,lines)
+            events=idle_wait(); dt=clock.tick()/1000.0
+        else:
+            if static: static.reset()
+            ms=clock.tick(FPS) if rend.draws else 1000/FPS   # simulation runs unthrottled, fixed step
+            dt=min(ms/1000.0, 1/30.0); perf.begin(ms); RECT_ALLOCS[0]=0
+            events=pygame.event.get()
         MUSIC.update(dt)
 
-        # Optional: monitor frame time
-        # frame_times.append(clock.get_time())
-        # if len(frame_times) > 60:
-        #     avg = sum(frame_times) / len(frame_times)
-        #     if avg > 1000/FPS + 1:
-        #         print(f"Warning: average frame time {avg:.2f} ms")
-        #     frame_times.clear()
-
-        for ev in pygame.event.get():
+        for ev in events:
             if ev.type==pygame.QUIT: running=False
+            if ev.type==pygame.VIDEOEXPOSE and static: static.reset()
             if ev.type==pygame.KEYDOWN:
                 if ev.key==pygame.K_ESCAPE: running=False
+                if ev.key==pygame.K_F3: perf.toggle()
                 if STATE=='title':
                     if ev.key==pygame.K_b: world_sel=(world_sel+1)%8
                     if ev.key in (pygame.K_RETURN,pygame.K_SPACE):
@@ -975,13 +2091,12 @@ def main():
                     elif ev.key==pygame.K_r:
                         load(world,lnum)
 
-        if STATE=='title':    draw_title(screen,big,font,world_sel); pygame.display.flip(); continue
-        if STATE=='gameover': draw_gameover(screen,big,font);        pygame.display.flip(); continue
-        if STATE=='worldclear':draw_worldclear(screen,big,font,world);pygame.display.flip(); continue
-        if STATE=='victory':  draw_victory(screen,big,font);         pygame.display.flip(); continue
+        if idle or not running: continue
+        perf.mark(P_EVENTS)
 
         # ── PLAY ──────────────────────────────────────────────
         lt=LEVEL_TYPE[(world,lnum)]
+        ANIM.tick()
         keys=pygame.key.get_pressed()
         ltimer-=dt
         if ltimer<=0: player.kill()
@@ -991,9 +2106,9 @@ def main():
 
         # Block bumps
         for bx,by in bumped:
-            tile=grid[by][bx]
+            tile=grid[by,bx]
             if tile in (QBLOCK,COIN_BLOCK):
-                grid[by][bx]=USED
+                set_tile(bx,by,USED)
                 if tile==COIN_BLOCK:
                     coin_anims.append(CoinAnim(bx*TILE,by*TILE))
                     score+=200; coins+=1; play('coin')
@@ -1002,14 +2117,15 @@ def main():
                     kind='flower' if player.status>=1 else 'mushroom'
                     powerups.append(PowerUp(bx*TILE+2,(by-1)*TILE,kind)); play('coin')
             elif tile==STAR_BLOCK:
-                grid[by][bx]=USED
+                set_tile(bx,by,USED)
                 powerups.append(PowerUp(bx*TILE+2,(by-1)*TILE,'star')); play('coin')
             elif tile==BRICK:
                 if player.big:
-                    grid[by][bx]=AIR; play('brick')
-                    for _ in range(6): particles.append(Particle(bx*TILE+TILE//2,by*TILE,RED_BRICK))
+                    set_tile(bx,by,AIR); play('brick')
+                    particles.spawn(bx*TILE+TILE//2,by*TILE,RED_BRICK,6)
                     score+=50
                 else: play('brick')
+        perf.mark(P_PLAYER)
 
         for pu in powerups: pu.update(grid)
         for pu in powerups:
@@ -1018,46 +2134,58 @@ def main():
         powerups=[p for p in powerups if p.alive]
 
         for fb in fireballs: fb.update(grid)
+        # foes was built after last frame's enemy update; nothing has moved them since
         for fb in fireballs:
             if not fb.alive: continue
-            for e in enemies:
+            r=fb.rect
+            for e in foes.query(r.x,r.w):
                 if not e.get('alive',False) or e['type']=='firebar': continue
-                if fb.rect.colliderect(e['rect']):
+                if r.colliderect(e['rect']):
                     if e['type']=='bowser':
                         e['hp']-=1
                         if e['hp']<=0: e['alive']=False; e['death_timer']=30; score+=5000
                         play('bowser_hit')
                     else:
                         e['alive']=False; e['death_timer']=20; score+=200
-                        particles.append(Particle(e['rect'].centerx,e['rect'].centery))
+                        particles.spawn(e['rect'].centerx,e['rect'].centery)
                     fb.alive=False; break
         fireballs=[f for f in fireballs if f.alive]
 
+        shots.clear()
         for m in misc:
             if not m['alive']: continue
             m['x']+=m['vx']; m['y']+=m['vy']
             if m['kind']=='hammer': m['vy']+=0.4
             m['t']+=1
             if m['t']>180 or m['x']<0 or m['x']>LW*TILE: m['alive']=False
-            if player.rect.colliderect(pygame.Rect(int(m['x']),int(m['y']),12,12)):
+            else: shots.insert(m,int(m['x']),12)
+        pr=player.rect
+        for m in shots.query(pr.x,pr.w):
+            if hits(pr,int(m['x']),int(m['y']),12,12):
                 player.hit(); m['alive']=False
         misc=[m for m in misc if m['alive']]
 
         for c in coin_anims: c.update()
         coin_anims=[c for c in coin_anims if c.alive]
 
+        perf.mark(P_COLLIDE)
+        spawner.update(cam,grid,enemies)
         for e in enemies: update_enemy(e,grid,player,particles,misc)
-        score+=enemy_player_collide(player,enemies,particles,misc)
+        foes.clear()
+        for e in enemies:
+            if e['alive']: foes.insert(e,e['rect'].x,e['rect'].w)
+        perf.mark(P_ENEMIES)
+        score+=enemy_player_collide(player,foes,particles,misc)
 
         if not flagpole.sliding and not player.dead:
             bonus=flagpole.check(player)
             if bonus: score+=bonus
+        perf.mark(P_COLLIDE)
         flagpole.update(player)
 
-        for p in particles: p.update()
-        particles=[p for p in particles if p.life>0]
+        particles.update()
 
-        cam=max(0,min(int(player.x)-SW//2,LW*TILE-SW))
+        cam=max(0,min(int(player.x)-SW//2,LW*TILE-SW)); cam-=cam%LOWRES
 
         if flagpole.done:
             flagpole.clear_t-=1
@@ -1073,26 +2201,54 @@ def main():
             lives-=1
             STATE='gameover' if lives<=0 else None
             if lives>0: load(world,lnum)
+        perf.mark(P_UPDATE)
+        if not rend.draws: continue
 
         # ── DRAW ──────────────────────────────────────────────
-        screen.fill(lt_sky(lt))
-        draw_bg(screen,lt,cam)
-        draw_tiles(screen,grid,cam,lt)
-        flagpole.draw(screen,cam)
-        for pu in powerups: pu.draw(screen,cam)
-        for c in coin_anims: c.draw(screen,cam)
+        draw_bg(backdrop,lt,cam,LOWRES)
+        perf.mark(P_BG)
+        draw_tiles(backdrop,grid,cam//LOWRES,lt,tilemap,RTILE)
+        if PAL:   # swap the live colours in just for the 8-bit -> RGB blit
+            backdrop.set_palette(PAL.live(lt))
+            if LOWRES==1: rend.upscale(backdrop)
+            else: scene.blit(backdrop,(0,0))
+            backdrop.set_palette(PAL.colors)
+        perf.mark(P_TILES)
+        flagpole.draw(scene,cam,LOWRES)
+        cull.begin(cam); rq.layer('items')
+        for pu in powerups:
+            if pu.alive and cull.visible(pu.x,TILE-4): pu.draw(rq,cam)
+        for c in coin_anims:
+            if cull.visible(c.x,16): c.draw(rq,cam)
         for m in misc:
-            if not m['alive']: continue
-            col=HAMMER_C if m['kind']=='hammer' else FIRE_C
-            pygame.draw.rect(screen,col,(int(m['x'])-cam,int(m['y']),12,12))
-        for fb in fireballs: fb.draw(screen,cam)
-        for e in enemies: draw_enemy(screen,e,cam)
-        for p in particles: p.draw(screen,cam)
-        player.draw(screen,cam)
-        draw_hud(screen,world,lnum,score,coins,lives,ltimer,font)
-        pygame.display.flip()
-
+            if m['alive'] and cull.visible(m['x'],12):
+                blit_sprite(rq,m['kind'],int(m['x'])-cam,int(m['y']))
+        for fb in fireballs:
+            if cull.visible(fb.x,10): fb.draw(rq,cam)
+        rq.layer('enemies')
+        for e in enemies:
+            if e['alive'] and cull.visible(e['rect'].x,e['rect'].w): draw_enemy(rq,e,cam)
+        cull.count(particles.draw(rq.layer('particles'),cam),len(particles))
+        player.draw(rq.layer('player'),cam)
+        rq.flush(scene,LOWRES)
+        if LOWRES>1: rend.upscale(scene)
+        perf.mark(P_ENTITIES)
+        hud.draw(screen,world,lnum,score,coins,lives,ltimer)
+        if perf.on:
+            perf.draw(screen,[f"enemies {sum(1 for e in enemies if e['alive'])}/{len(enemies)}"
+                              f"  spawned {spawner.i}/{len(spawner.spawns)}  particles {len(particles)}",
+                              f"items {len(powerups)+len(coin_anims)}  shots {len(fireballs)+len(misc)}",
+                              f"drawn {cull.drawn}  culled {cull.culled}  blits {rq.queued}",
+                              f"rects {RECT_ALLOCS[0]}/frame  hash {foes.n} in {len(foes.cells)} cols"])
+        perf.mark(P_HUD)
+        if cap: cap.grab(rend.surface())
+        rend.present()
+        perf.mark(P_FLIP)
+
+    if TEXT_STATS: print(TEXT.stats())
+    if cap: print(cap.close())
     pygame.quit(); sys.exit()
 
 if __name__=="__main__":
-    main()
+    if '--export-sprites' in sys.argv[1:]: print(f"wrote {export_sprites()}")
+    else: main()
@@ -23,8 +23,10 @@ Improvements vs original code:
 import pygame
 import numpy as np
 import sys
+import os
 import random
 import math
+from collections import OrderedDict
 
 # ──────────────────────────────────────────────────────────────
 #  INIT
@@ -736,54 +738,106 @@ def enemy_player_collide(player,enemies,particles,misc):
                 player.hit()
     return score
 
+# ──────────────────────────────────────────────────────────────
+#  TEXT CACHE  (shared fonts + LRU of rendered strings)
+# ──────────────────────────────────────────────────────────────
+FONT_SM  = 26
+FONT_BIG = 60
+
+class TextCache:
+    """Owns one SysFont per size and an LRU of rendered text surfaces keyed
+    by (text, color, size). hits/misses are kept for production checks."""
+    def __init__(self,cap=256):
+        self.cap=cap; self._fonts={}; self._lru=OrderedDict()
+        self.hits=0; self.misses=0
+
+    def font(self,size):
+        f=self._fonts.get(size)
+        if f is None: f=self._fonts[size]=pygame.font.SysFont(None,size)
+        return f
+
+    def render(self,text,color,size):
+        key=(text,color,size); s=self._lru.get(key)
+        if s is not None:
+            self.hits+=1; self._lru.move_to_end(key); return s
+        self.misses+=1
+        s=self._lru[key]=self.font(size).render(text,True,color)
+        if len(self._lru)>self.cap: self._lru.popitem(last=False)
+        return s
+
+    def stats(self):
+        n=self.hits+self.misses
+        return f"text cache: {self.hits} hits / {self.misses} misses ({100*self.hits/max(1,n):.1f}% hit)"
+
+TEXT = TextCache()
+TEXT_STATS = os.environ.get('SMB_STATS','0') not in ('','0')   # print cache stats on exit
+
+# ──────────────────────────────────────────────────────────────
+#  TILE ATLAS  (every tile ID rasterized once per tile size)
+# ──────────────────────────────────────────────────────────────
+KEY_C = (255,0,255)      # colorkey for the transparent parts of cached art
+_ATLAS = {}
+
+def _raster_tile(tile,T):
+    """Draw one tile ID into its own surface. Returns (surface, x-offset).
+    The extra keyed pixel on the right/bottom keeps the 1px line overhang."""
+    lip=tile in (PIPE_TL,PIPE_TR)
+    s=pygame.Surface((T+5 if lip else T+1,T+1)); s.fill(KEY_C)
+    rx=4 if tile==PIPE_TL else 0; ry=0
+    if tile==GROUND:
+        pygame.draw.rect(s,BROWN,(rx,ry,T,T))
+        pygame.draw.rect(s,DARK_BRN,(rx,ry,T,T),2)
+        pygame.draw.line(s,DARK_BRN,(rx,ry+T//2),(rx+T,ry+T//2),1)
+        pygame.draw.line(s,DARK_BRN,(rx+T//2,ry),(rx+T//2,ry+T),1)
+    elif tile==BRICK:
+        pygame.draw.rect(s,RED_BRICK,(rx,ry,T,T))
+        pygame.draw.line(s,(240,100,30),(rx,ry+T//2),(rx+T,ry+T//2),2)
+        pygame.draw.line(s,(240,100,30),(rx+T//2,ry),(rx+T//2,ry+T//2),2)
+        pygame.draw.line(s,(240,100,30),(rx+T//4,ry+T//2),(rx+T//4,ry+T),2)
+        pygame.draw.line(s,(240,100,30),(rx+3*T//4,ry+T//2),(rx+3*T//4,ry+T),2)
+    elif tile==QBLOCK:
+        pygame.draw.rect(s,QBLK_YLW,(rx,ry,T,T))
+        pygame.draw.rect(s,(200,140,0),(rx,ry,T,T),3)
+        q=TEXT.render('?',BLACK,int(T*0.7))
+        s.blit(q,(rx+T//2-q.get_width()//2,ry+T//2-q.get_height()//2))
+    elif tile==USED:
+        pygame.draw.rect(s,USED_CLR,(rx,ry,T,T))
+        pygame.draw.rect(s,(100,70,30),(rx,ry,T,T),2)
+    elif tile in (PIPE_TL,PIPE_BL,PIPE_TR,PIPE_BR):
+        pygame.draw.rect(s,PIP_GRN,(rx,ry,T,T))
+        pygame.draw.rect(s,PIP_DRK,(rx,ry,T,T),3)
+        if lip:
+            pygame.draw.rect(s,PIP_GRN,(0,ry,T+4,T//2))
+            pygame.draw.rect(s,PIP_DRK,(0,ry,T+4,T//2),3)
+    elif tile==PLATFORM:
+        pygame.draw.rect(s,BROWN,(rx,ry,T,T//2))
+        pygame.draw.rect(s,DARK_BRN,(rx,ry,T,T//2),2)
+    if pygame.display.get_surface(): s=s.convert()
+    s.set_colorkey(KEY_C,pygame.RLEACCEL)
+    return s,-rx
+
+def tile_atlas(T=TILE):
+    """Tile ID -> (surface, x-offset) for tile size T, built on first use."""
+    atlas=_ATLAS.get(T)
+    if atlas is None:
+        atlas={t:_raster_tile(t,T) for t in
+               (GROUND,BRICK,QBLOCK,USED,PIPE_TL,PIPE_TR,PIPE_BL,PIPE_BR,PLATFORM)}
+        atlas[COIN_BLOCK]=atlas[STAR_BLOCK]=atlas[QBLOCK]
+        _ATLAS[T]=atlas
+    return atlas
+
 # ──────────────────────────────────────────────────────────────
 #  TILE RENDERER
 # ──────────────────────────────────────────────────────────────
-_fnt_sm = None
 def draw_tiles(screen,grid,cx,lt):
-    global _fnt_sm
-    if _fnt_sm is None: _fnt_sm=pygame.font.SysFont(None,int(TILE*0.7))
+    atlas=tile_atlas(TILE)
     H,W=len(grid),len(grid[0])
     c0=max(0,cx//TILE-1); c1=min(W,cx//TILE+SW//TILE+2)
     for row in range(H):
+        ry=row*TILE; line=grid[row]
         for col in range(c0,c1):
-            tile=grid[row][col]; T=TILE
-            if tile==AIR: continue
-            rx=col*T-cx; ry=row*T
-            if tile==GROUND:
-                pygame.draw.rect(screen,BROWN,(rx,ry,T,T))
-                pygame.draw.rect(screen,DARK_BRN,(rx,ry,T,T),2)
-                pygame.draw.line(screen,DARK_BRN,(rx,ry+T//2),(rx+T,ry+T//2),1)
-                pygame.draw.line(screen,DARK_BRN,(rx+T//2,ry),(rx+T//2,ry+T),1)
-            elif tile==BRICK:
-                pygame.draw.rect(screen,RED_BRICK,(rx,ry,T,T))
-                pygame.draw.line(screen,(240,100,30),(rx,ry+T//2),(rx+T,ry+T//2),2)
-                pygame.draw.line(screen,(240,100,30),(rx+T//2,ry),(rx+T//2,ry+T//2),2)
-                pygame.draw.line(screen,(240,100,30),(rx+T//4,ry+T//2),(rx+T//4,ry+T),2)
-                pygame.draw.line(screen,(240,100,30),(rx+3*T//4,ry+T//2),(rx+3*T//4,ry+T),2)
-            elif tile in (QBLOCK,COIN_BLOCK,STAR_BLOCK):
-                pygame.draw.rect(screen,QBLK_YLW,(rx,ry,T,T))
-                pygame.draw.rect(screen,(200,140,0),(rx,ry,T,T),3)
-                s=_fnt_sm.render('?',True,BLACK)
-                screen.blit(s,(rx+T//2-s.get_width()//2,ry+T//2-s.get_height()//2))
-            elif tile==USED:
-                pygame.draw.rect(screen,USED_CLR,(rx,ry,T,T))
-                pygame.draw.rect(screen,(100,70,30),(rx,ry,T,T),2)
-            elif tile in (PIPE_TL,PIPE_BL):
-                pygame.draw.rect(screen,PIP_GRN,(rx,ry,T,T))
-                pygame.draw.rect(screen,PIP_DRK,(rx,ry,T,T),3)
-                if tile==PIPE_TL:
-                    pygame.draw.rect(screen,PIP_GRN,(rx-4,ry,T+4,T//2))
-                    pygame.draw.rect(screen,PIP_DRK,(rx-4,ry,T+4,T//2),3)
-            elif tile in (PIPE_TR,PIPE_BR):
-                pygame.draw.rect(screen,PIP_GRN,(rx,ry,T,T))
-                pygame.draw.rect(screen,PIP_DRK,(rx,ry,T,T),3)
-                if tile==PIPE_TR:
-                    pygame.draw.rect(screen,PIP_GRN,(rx,ry,T+4,T//2))
-                    pygame.draw.rect(screen,PIP_DRK,(rx,ry,T+4,T//2),3)
-            elif tile==PLATFORM:
-                pygame.draw.rect(screen,BROWN,(rx,ry,T,T//2))
-                pygame.draw.rect(screen,DARK_BRN,(rx,ry,T,T//2),2)
+            a=atlas.get(line[col])
+            if a: screen.blit(a[0],(col*TILE-cx+a[1],ry))
     if lt=='castle':
         tms=pygame.time.get_ticks()
         for col in range(c0,c1):
@@ -850,42 +904,42 @@ def draw_bg(screen,lt,cx):
 # ──────────────────────────────────────────────────────────────
 #  HUD + SCREENS
 # ──────────────────────────────────────────────────────────────
-def draw_hud(screen,world,lnum,score,coins,lives,timer,font):
+def draw_hud(screen,world,lnum,score,coins,lives,timer):
     pygame.draw.rect(screen,BLACK,(0,0,SW,36))
     tc=WHITE if timer>100 else (255,80,80)
     txt=f"W{world}-{lnum}  SCORE:{score:07d}  COINS:{coins:02d}  x{lives}  TIME:{int(timer):03d}"
-    screen.blit(font.render(txt,True,WHITE),(10,8))
-    tip=font.render("N=skip  R=restart  B=world(title)  ESC=quit  X/Shift=run  Z/Ctrl=fire",True,(70,70,70))
+    screen.blit(TEXT.render(txt,WHITE,FONT_SM),(10,8))
+    tip=TEXT.render("N=skip  R=restart  B=world(title)  ESC=quit  X/Shift=run  Z/Ctrl=fire",(70,70,70),FONT_SM)
     screen.blit(tip,(SW//2-tip.get_width()//2,SH-20))
 
 def _center(screen,s,y): screen.blit(s,(SW//2-s.get_width()//2,y))
 
-def draw_title(screen,big,font,wsel):
+def draw_title(screen,wsel):
     screen.fill(BLACK)
-    _center(screen,big.render("SUPER MARIO BROS",True,WHITE),130)
+    _center(screen,TEXT.render("SUPER MARIO BROS",WHITE,FONT_BIG),130)
     for txt,col,y in [
         ("Enhanced Recreation  —  Worlds 1-1 through 8-4", QBLK_YLW, 210),
         ("Arrows/WASD=Move  Space=Jump  X/Shift=Run  Z/Ctrl=Fire", (180,180,180), 265),
         (f"World Select: {wsel+1}  (press B to change)", COIN_YLW, 315),
         ("Press ENTER or SPACE to start", WHITE, 390),
     ]:
-        _center(screen,font.render(txt,True,col),y)
+        _center(screen,TEXT.render(txt,col,FONT_SM),y)
 
-def draw_gameover(screen,big,font):
+def draw_gameover(screen):
     screen.fill(BLACK)
-    _center(screen,big.render("GAME OVER",True,WHITE),220)
-    _center(screen,font.render("Press ENTER to return to title",True,(180,180,180)),330)
+    _center(screen,TEXT.render("GAME OVER",WHITE,FONT_BIG),220)
+    _center(screen,TEXT.render("Press ENTER to return to title",(180,180,180),FONT_SM),330)
 
-def draw_worldclear(screen,big,font,w):
+def draw_worldclear(screen,w):
     screen.fill(BLACK)
-    _center(screen,big.render(f"WORLD {w} CLEAR!",True,QBLK_YLW),200)
-    _center(screen,font.render("Press ENTER to continue",True,WHITE),310)
+    _center(screen,TEXT.render(f"WORLD {w} CLEAR!",QBLK_YLW,FONT_BIG),200)
+    _center(screen,TEXT.render("Press ENTER to continue",WHITE,FONT_SM),310)
 
-def draw_victory(screen,big,font):
+def draw_victory(screen):
     screen.fill(BLACK)
-    _center(screen,big.render("YOU WIN!",True,QBLK_YLW),180)
-    _center(screen,font.render("Congratulations! All 8 worlds completed!",True,WHITE),280)
-    _center(screen,font.render("Press ENTER to play again",True,(180,180,180)),360)
+    _center(screen,TEXT.render("YOU WIN!",QBLK_YLW,FONT_BIG),180)
+    _center(screen,TEXT.render("Congratulations! All 8 worlds completed!",WHITE,FONT_SM),280)
+    _center(screen,TEXT.render("Press ENTER to play again",(180,180,180),FONT_SM),360)
 
 # ──────────────────────────────────────────────────────────────
 #  MAIN
@@ -894,7 +948,6 @@ def main():
     screen=pygame.display.set_mode((SW,SH))
     pygame.display.set_caption("Super Mario Bros — Enhanced (1-1 to 8-4)")
     clock=pygame.time.Clock()
-    font=pygame.font.SysFont(None,26); big=pygame.font.SysFont(None,60)
 
     STATE='title'; world=1; lnum=1
     score=0; coins=0; lives=3; world_sel=0
@@ -946,10 +999,10 @@ def main():
                     elif ev.key==pygame.K_r:
                         load(world,lnum)
 
-        if STATE=='title':    draw_title(screen,big,font,world_sel); pygame.display.flip(); continue
-        if STATE=='gameover': draw_gameover(screen,big,font);        pygame.display.flip(); continue
-        if STATE=='worldclear':draw_worldclear(screen,big,font,world);pygame.display.flip(); continue
-        if STATE=='victory':  draw_victory(screen,big,font);         pygame.display.flip(); continue
+        if STATE=='title':    draw_title(screen,world_sel);   pygame.display.flip(); continue
+        if STATE=='gameover': draw_gameover(screen);          pygame.display.flip(); continue
+        if STATE=='worldclear':draw_worldclear(screen,world); pygame.display.flip(); continue
+        if STATE=='victory':  draw_victory(screen);           pygame.display.flip(); continue
 
         # ── PLAY ──────────────────────────────────────────────
         lt=LEVEL_TYPE[(world,lnum)]
@@ -1060,9 +1113,10 @@ def main():
         for e in enemies: draw_enemy(screen,e,cam)
         for p in particles: p.draw(screen,cam)
         player.draw(screen,cam)
-        draw_hud(screen,world,lnum,score,coins,lives,ltimer,font)
+        draw_hud(screen,world,lnum,score,coins,lives,ltimer)
         pygame.display.flip()
 
+    if TEXT_STATS: print(TEXT.stats())
     pygame.quit(); sys.exit()
 
 if __name__=="__main__":
@@ -1,7 +1,9 @@
 import pygame
 import numpy as np
 import sys
+import os
 import random
+from collections import OrderedDict
 import math  # Moved import to top level
 
 # -------------------------
@@ -636,6 +638,52 @@ class Flagpole:
         pygame.draw.rect(screen, FLAG_COLOR, (rx - 24, self.flag_y, 24, 16))
         pygame.draw.circle(screen, (255, 215, 0), (rx + 3, self.top_y), 6)
 
+# -------------------------
+# Text cache (shared fonts + rendered strings)
+# -------------------------
+FONT_SIZE     = 28
+BIG_FONT_SIZE = 64
+
+
+class TextCache:
+    """Owns one SysFont per size and an LRU cache of rendered text surfaces
+    keyed by (text, color, size). hits/misses are kept to check the hit rate."""
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        f = self.fonts.get(size)
+        if f is None:
+            f = self.fonts[size] = pygame.font.SysFont(None, size)
+        return f
+
+    def render(self, text, color, size):
+        key = (text, color, size)
+        s = self.surfaces.get(key)
+        if s is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return s
+        self.misses += 1
+        s = self.surfaces[key] = self.font(size).render(text, True, color)
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return s
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = 100 * self.hits / max(1, total)
+        return f"text cache: {self.hits} hits / {self.misses} misses ({rate:.1f}% hit)"
+
+
+TEXT = TextCache()
+TEXT_STATS = os.environ.get('SMB_STATS','0') not in ('','0')   # print cache stats on exit
+
 # -------------------------
 # Draw level tiles
 # -------------------------
@@ -665,8 +713,7 @@ def draw_tiles(screen, grid, camera_x, ltype):
             elif tile in (QUESTION, COIN_BLOCK):
                 pygame.draw.rect(screen, QUESTION_COLOR, (rx, ry, TILE_SIZE, TILE_SIZE))
                 pygame.draw.rect(screen, (200, 140, 0), (rx, ry, TILE_SIZE, TILE_SIZE), 3)
-                font_sm = pygame.font.SysFont(None, 28)
-                s = font_sm.render('?', True, BLACK)
+                s = TEXT.render('?', BLACK, FONT_SIZE)
                 screen.blit(s, (rx + TILE_SIZE // 2 - s.get_width() // 2, ry + TILE_SIZE // 2 - s.get_height() // 2))
             elif tile == USED_BLOCK:
                 pygame.draw.rect(screen, USED_COLOR, (rx, ry, TILE_SIZE, TILE_SIZE))
@@ -697,46 +744,46 @@ def draw_tiles(screen, grid, camera_x, ltype):
 # -------------------------
 # HUD
 # -------------------------
-def draw_hud(screen, world, level_num, score, coins, lives, font):
+def draw_hud(screen, world, level_num, score, coins, lives):
     pygame.draw.rect(screen, BLACK, (0, 0, SCREEN_WIDTH, 36))
-    s = font.render(f"WORLD {world}-{level_num}   SCORE:{score:06d}   COINS:{coins:02d}   LIVES:{lives}", True, WHITE)
+    s = TEXT.render(f"WORLD {world}-{level_num}   SCORE:{score:06d}   COINS:{coins:02d}   LIVES:{lives}", WHITE, FONT_SIZE)
     screen.blit(s, (10, 8))
 
 # -------------------------
 # Screens
 # -------------------------
-def title_screen(screen, font, big_font):
+def title_screen(screen):
     screen.fill(BLACK)
-    t = big_font.render("SUPER MARIO BROS", True, WHITE)
+    t = TEXT.render("SUPER MARIO BROS", WHITE, BIG_FONT_SIZE)
     screen.blit(t, (SCREEN_WIDTH // 2 - t.get_width() // 2, 150))
-    s = font.render("Worlds 1-1 through 8-4", True, QUESTION_COLOR)
+    s = TEXT.render("Worlds 1-1 through 8-4", QUESTION_COLOR, FONT_SIZE)
     screen.blit(s, (SCREEN_WIDTH // 2 - s.get_width() // 2, 240))
-    p = font.render("Arrow Keys / WASD to move, SPACE/W to jump", True, (180, 180, 180))
+    p = TEXT.render("Arrow Keys / WASD to move, SPACE/W to jump", (180, 180, 180), FONT_SIZE)
     screen.blit(p, (SCREEN_WIDTH // 2 - p.get_width() // 2, 310))
-    st = font.render("Press ENTER or SPACE to start", True, WHITE)
+    st = TEXT.render("Press ENTER or SPACE to start", WHITE, FONT_SIZE)
     screen.blit(st, (SCREEN_WIDTH // 2 - st.get_width() // 2, 400))
 
-def game_over_screen(screen, font, big_font):
+def game_over_screen(screen):
     screen.fill(BLACK)
-    t = big_font.render("GAME OVER", True, WHITE)
+    t = TEXT.render("GAME OVER", WHITE, BIG_FONT_SIZE)
     screen.blit(t, (SCREEN_WIDTH // 2 - t.get_width() // 2, 220))
-    s = font.render("Press ENTER to play again", True, (180, 180, 180))
+    s = TEXT.render("Press ENTER to play again", (180, 180, 180), FONT_SIZE)
     screen.blit(s, (SCREEN_WIDTH // 2 - s.get_width() // 2, 330))
 
-def world_clear_screen(screen, font, big_font, world):
+def world_clear_screen(screen, world):
     screen.fill(BLACK)
-    t = big_font.render(f"WORLD {world} CLEAR!", True, QUESTION_COLOR)
+    t = TEXT.render(f"WORLD {world} CLEAR!", QUESTION_COLOR, BIG_FONT_SIZE)
     screen.blit(t, (SCREEN_WIDTH // 2 - t.get_width() // 2, 200))
-    s = font.render("Press ENTER to continue", True, WHITE)
+    s = TEXT.render("Press ENTER to continue", WHITE, FONT_SIZE)
     screen.blit(s, (SCREEN_WIDTH // 2 - s.get_width() // 2, 310))
 
-def victory_screen(screen, font, big_font):
+def victory_screen(screen):
     screen.fill(BLACK)
-    t = big_font.render("YOU WIN!", True, QUESTION_COLOR)
+    t = TEXT.render("YOU WIN!", QUESTION_COLOR, BIG_FONT_SIZE)
     screen.blit(t, (SCREEN_WIDTH // 2 - t.get_width() // 2, 180))
-    s = font.render("Congratulations! You completed all 8 worlds!", True, WHITE)
+    s = TEXT.render("Congratulations! You completed all 8 worlds!", WHITE, FONT_SIZE)
     screen.blit(s, (SCREEN_WIDTH // 2 - s.get_width() // 2, 280))
-    p = font.render("Press ENTER to play again", True, (180, 180, 180))
+    p = TEXT.render("Press ENTER to play again", (180, 180, 180), FONT_SIZE)
     screen.blit(p, (SCREEN_WIDTH // 2 - p.get_width() // 2, 360))
 
 # -------------------------
@@ -746,8 +793,6 @@ def main():
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Super Mario Bros 1-1 to 8-4")
     clock = pygame.time.Clock()
-    font     = pygame.font.SysFont(None, 28)
-    big_font = pygame.font.SysFont(None, 64)
 
     STATE = 'title'
     world, level_num = 1, 1
@@ -817,22 +862,22 @@ def main():
 
         # --- Draw ---
         if STATE == 'title':
-            title_screen(screen, font, big_font)
+            title_screen(screen)
             pygame.display.flip()
             continue
 
         if STATE == 'gameover':
-            game_over_screen(screen, font, big_font)
+            game_over_screen(screen)
             pygame.display.flip()
             continue
 
         if STATE == 'worldclear':
-            world_clear_screen(screen, font, big_font, world)
+            world_clear_screen(screen, world)
             pygame.display.flip()
             continue
 
         if STATE == 'victory':
-            victory_screen(screen, font, big_font)
+            victory_screen(screen)
             pygame.display.flip()
             continue
 
@@ -958,20 +1003,21 @@ def main():
             p.draw(screen, camera_x)
 
         player.draw(screen, camera_x)
-        draw_hud(screen, world, level_num, score, coins, lives, font)
+        draw_hud(screen, world, level_num, score, coins, lives)
 
         # Timer display
         tsec = int(level_timer)
         tc = WHITE if tsec > 100 else (255, 80, 80)
-        ts = font.render(f"TIME {tsec:03d}", True, tc)
+        ts = TEXT.render(f"TIME {tsec:03d}", tc, FONT_SIZE)
         screen.blit(ts, (SCREEN_WIDTH - 120, 8))
 
         # Tip
-        tip = font.render("N=skip level  ESC=quit", True, (100, 100, 100))
+        tip = TEXT.render("N=skip level  ESC=quit", (100, 100, 100), FONT_SIZE)
         screen.blit(tip, (SCREEN_WIDTH // 2 - tip.get_width() // 2, SCREEN_HEIGHT - 22))
 
         pygame.display.flip()
 
+    if TEXT_STATS: print(TEXT.stats())
     pygame.quit()
     sys.exit()
 